@@ -1,13 +1,16 @@
 from fastapi import FastAPI
-import os, math
+import codecs, io, os, math, time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 import json
 
-from fastapi import Body
+from fastapi import Body, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
 # app.py (snippets)
-from .routes.xml_process_corpus import router as corpus_router
+from .routes.xml_process_corpus import router as corpus_router, close_executor
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from psycopg.types.json import Json
@@ -16,10 +19,25 @@ from psycopg.rows import dict_row
 from collections import defaultdict
 from lxml import etree
 
-from api.services.move_ingest import default_session_id, ingest_one_text, sentence_split
+from api import db, onnx_embedding
+from api.services import cache, metrics, predict
+from api.services.jobs import cancel_job, enqueue_job, get_job, report_progress
+from api.services.xml_rules import RULES_CACHE, compile_rules
+from api.services.move_ingest import SentenceBuffer, default_session_id, ingest_texts, sentence_split
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await db.open_pools()
+    cache.start_invalidation_listener(db.DB_URL)
+    try:
+        yield
+    finally:
+        close_executor()
+        await db.close_pools()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(corpus_router)
+app.add_middleware(metrics.MetricsMiddleware)
 
 # If you want to be strict, list your exact origins instead of ["*"]
 app.add_middleware(
@@ -30,7 +48,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-DB_URL = os.environ["DATABASE_URL"]
+DB_URL = db.DB_URL
 
 class ConceptIn(BaseModel):
     key: str
@@ -70,29 +88,91 @@ def vec_sub(b, a, d=EMB_DIM):
 @app.get("/health")
 def health():
     try:
-        with psycopg.connect(DB_URL) as conn:
+        with db.connection() as conn:
             conn.execute("select 1")
         return {"status":"ok"}
     except Exception as e:
         return {"status":"db-fail","error":str(e)}
 
+@app.get("/health/pools")
+def health_pools():
+    return db.pool_stats()
+
+@app.get("/health/cache")
+def health_cache():
+    return {**cache.stats(), RULES_CACHE.name: RULES_CACHE.stats()}
+
+@app.get("/health/embedding")
+def health_embedding():
+    return onnx_embedding.stats()
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(db.pool_stats()), media_type=metrics.CONTENT_TYPE)
+
+def _enqueue(kind: str, body: dict):
+    with db.connection() as conn:
+        job_id = enqueue_job(conn, kind, body)
+    return {"ok": True, "job_id": job_id, "state": "queued"}
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: int):
+    with db.connection() as conn:
+        job = get_job(conn, job_id)
+    if not job:
+        raise HTTPException(404, "job not found")
+    return job
+
+@app.get("/jobs/{job_id}/progress")
+def job_progress(job_id: int):
+    with db.connection() as conn:
+        job = get_job(conn, job_id)
+    if not job:
+        raise HTTPException(404, "job not found")
+    return {"id": job["id"], "state": job["state"], "progress": job["progress"]}
+
+@app.post("/jobs/{job_id}/cancel")
+def job_cancel(job_id: int):
+    with db.connection() as conn:
+        state = cancel_job(conn, job_id)
+    if state is None:
+        raise HTTPException(404, "job not found")
+    return {"id": job_id, "state": state, "cancel_requested": True}
+
 @app.get("/curvature/top")
-def curvature_top(domain: str = "*", k: int = 20):
-    q = """
-    SELECT domain, ch_a, ch_b, COUNT(*) AS n, AVG(weight) AS w
-    FROM curvature_multi
-    WHERE (%s='*' OR domain=%s)
+def curvature_top(domain: str = "*", k: int = 20, frame_a: Optional[int] = None, frame_b: Optional[int] = None):
+    """
+    Channel pairs by mean curvature weight. Reads curvature_rollup, the
+    per (domain, channel pair, frame pair) totals that triggers keep in step
+    with curvature_multi, so the cost tracks the number of channel pairs
+    rather than curvature rows. frame_a/frame_b restrict to one frame pair.
+    """
+    where, params = [], []
+    if domain != "*":
+        where.append("domain = %s")
+        params.append(domain)
+    if frame_a is not None:
+        where.append("frame_a = %s")
+        params.append(frame_a)
+    if frame_b is not None:
+        where.append("frame_b = %s")
+        params.append(frame_b)
+    q = f"""
+    SELECT domain, ch_a, ch_b, SUM(n)::bigint AS n, SUM(w_sum) / NULLIF(SUM(w_n), 0) AS w
+    FROM curvature_rollup
+    {"WHERE " + " AND ".join(where) if where else ""}
     GROUP BY 1,2,3
     ORDER BY w DESC NULLS LAST, n DESC
     LIMIT %s;
     """
-    with psycopg.connect(DB_URL, row_factory=dict_row) as conn, conn.cursor() as cur:
-        cur.execute(q, (domain, domain, k))
+    with db.connection(row_factory=dict_row) as conn, conn.cursor() as cur:
+        with metrics.query("curvature_top"):
+            cur.execute(q, (*params, k))
         return [dict(r) for r in cur.fetchall()]
 
 @app.get("/truths/recent")
 def truths_recent(k: int = 20):
-    with psycopg.connect(DB_URL, row_factory=dict_row) as conn, conn.cursor() as cur:
+    with db.connection(row_factory=dict_row) as conn, conn.cursor() as cur:
         cur.execute("""
           SELECT id, claim, COALESCE(method,'') AS method,
                  ROUND(confidence::numeric,3) AS confidence, source, evidence
@@ -104,7 +184,7 @@ def truths_recent(k: int = 20):
         
 @app.post("/concepts")
 def upsert_concept(c: ConceptIn):
-    with psycopg.connect(DB_URL) as conn:
+    with db.connection() as conn:
         with conn.cursor(row_factory=dict_row) as cur:
             cur.execute("SELECT id FROM concept WHERE key=%s", (c.key,))
             row = cur.fetchone()
@@ -116,65 +196,138 @@ def upsert_concept(c: ConceptIn):
                 cur.execute("INSERT INTO concept (key, label, embedding) VALUES (%s,%s,%s) RETURNING id",
                             (c.key, c.label, to_dim(c.embedding)))
                 cid = cur.fetchone()["id"]
+            cache.publish(conn, concepts=[c.key])
             conn.commit()
     return {"id": cid, "key": c.key}
 
-@app.post("/observe")
-def observe(obs: ObservationIn):
-    with psycopg.connect(DB_URL) as conn, conn.cursor() as cur:
-        # write raw sequence
-        for i, k in enumerate(obs.sequence):
-            cur.execute("SELECT id, embedding FROM concept WHERE key=%s", (k,))
-            row = cur.fetchone()
-            if not row: raise ValueError(f"unknown concept key {k}")
-            cur.execute("INSERT INTO observation (session_id, seq, concept_id, outcome) VALUES (%s,%s,%s,%s)",
-                        (obs.session_id, i, row[0], obs.outcome))
-        # accumulate transitions and weights
-        for i in range(len(obs.sequence)-1):
-            a, b = obs.sequence[i], obs.sequence[i+1]
-            cur.execute("SELECT id, embedding FROM concept WHERE key=%s", (a,))
-            sa, ea = cur.fetchone()
-            cur.execute("SELECT id, embedding FROM concept WHERE key=%s", (b,))
-            sb, eb = cur.fetchone()
-
-            # old and has str-str error:: delta = [eb[j]-ea[j] for j in range(len(eb))]
-            # upsert trajectory
-			# New way where we to_dim the values:: ea, eb come back as strings or lists; normalize then compute delta
-            delta = vec_sub(eb, ea, EMB_DIM)
-
+def _lookup_concepts(cur, keys, cached: bool = True) -> Dict[str, tuple]:
+    """
+    key -> (id, embedding), served from the concept cache where possible.
+    cached=False goes straight to the database, for keys the caller has
+    already missed in the cache (so the miss is not counted twice).
+    """
+    concepts, missing = {}, []
+    for k in keys:
+        hit = cache.CONCEPTS.get(k) if cached else None
+        if hit is None: missing.append(k)
+        else: concepts[k] = hit
+    if missing:
+        with metrics.query("concept_lookup"):
+            rows = cur.connection.execute("SELECT key, id, embedding FROM concept WHERE key = ANY(%s)", (missing,))
+        for key, cid, emb in rows.fetchall():
+            concepts[key] = (cid, to_dim(emb))
+            cache.CONCEPTS.put(key, concepts[key])
+    return concepts
+
+def _record_observations(cur, batch: List[ObservationIn]) -> Dict[str, int]:
+    """
+    Write observation rows and accumulate trajectory transitions for many
+    sessions in a fixed number of statements, independent of sequence length.
+    """
+    keys = sorted({k for obs in batch for k in obs.sequence})
+    concepts = _lookup_concepts(cur, keys)
+    for k in keys:
+        if k not in concepts: raise ValueError(f"unknown concept key {k}")
+
+    # write raw sequences
+    obs_rows = [(obs.session_id, i, concepts[k][0], obs.outcome)
+                for obs in batch for i, k in enumerate(obs.sequence)]
+    if obs_rows:
+        with metrics.query("observation_insert"):
             cur.execute("""
-              INSERT INTO trajectory (source_id, target_id, delta, weight, freq, last_seen, context)
-              VALUES (%s,%s,%s, 0.0, 1, now(), %s)
-              ON CONFLICT DO NOTHING
-            """, (sa, sb, to_dim(delta, EMB_DIM), None))
-
-            # update weight/freq
+              INSERT INTO observation (session_id, seq, concept_id, outcome)
+              SELECT * FROM unnest(%s::text[], %s::int[], %s::bigint[], %s::text[])
+            """, tuple(map(list, zip(*obs_rows))))
+
+    # accumulate transitions; repeated pairs collapse into one row with a count
+    counts: Dict[tuple, int] = defaultdict(int)
+    for obs in batch:
+        for a, b in zip(obs.sequence, obs.sequence[1:]):
+            counts[(a, b)] += 1
+    if counts:
+        src, tgt, deltas, freqs = [], [], [], []
+        for (a, b), n in counts.items():
+            (sa, ea), (sb, eb) = concepts[a], concepts[b]
+            src.append(sa)
+            tgt.append(sb)
+            deltas.append("[" + ",".join(map(str, to_dim(vec_sub(eb, ea, EMB_DIM), EMB_DIM))) + "]")
+            freqs.append(n)
+        with metrics.query("trajectory_upsert"):
             cur.execute("""
-              UPDATE trajectory
-              SET freq = freq + 1,
-                  weight = 1 - exp(-0.15 * (freq + 1)),
+              INSERT INTO trajectory (source_id, target_id, delta, weight, freq, last_seen, context)
+              SELECT u.s, u.t, u.d::vector, 1 - exp(-0.15 * u.n), u.n, now(), NULL
+              FROM unnest(%s::bigint[], %s::bigint[], %s::text[], %s::int[]) AS u(s, t, d, n)
+              ON CONFLICT (source_id, target_id) DO UPDATE
+              SET freq = trajectory.freq + EXCLUDED.freq,
+                  weight = 1 - exp(-0.15 * (trajectory.freq + EXCLUDED.freq)),
                   last_seen = now()
-              WHERE source_id=%s AND target_id=%s
-            """, (sa, sb))
+            """, (src, tgt, deltas, freqs))
+        # predictions for these sources are stale once this commits
+        cache.publish(cur.connection, sources=src)
+
+    return {"observations": len(obs_rows), "transitions": len(counts)}
+
+@app.post("/observe")
+def observe(obs: ObservationIn):
+    with db.connection() as conn, conn.cursor() as cur:
+        _record_observations(cur, [obs])
         conn.commit()
     return {"status": "ok"}
 
+@app.post("/observe/batch")
+def observe_batch(batch: List[ObservationIn]):
+    with db.connection() as conn, conn.cursor() as cur:
+        out = _record_observations(cur, batch)
+        conn.commit()
+    return {"status": "ok", "sessions": len(batch), **out}
+
 @app.get("/predict/next/{key}")
-def predict_next(key: str, k: int = 5):
-    with psycopg.connect(DB_URL) as conn, conn.cursor(row_factory=dict_row) as cur:
-        cur.execute("SELECT id, embedding FROM concept WHERE key=%s", (key,))
-        row = cur.fetchone()
-        if not row: return {"predictions": []}
-        source_id = row["id"]
-        # naive: return top by weight/freq (fast baseline)
-        cur.execute("""
-          SELECT t.target_id, t.weight, t.freq, c.key AS target_key
-          FROM trajectory t JOIN concept c ON c.id = t.target_id
-          WHERE t.source_id = %s
-          ORDER BY t.weight DESC, t.freq DESC
-          LIMIT %s
-        """, (source_id, k))
-        return {"predictions": list(cur.fetchall())}
+def predict_next(key: str, k: int = 5, mode: str = "observed", alpha: float = 0.5,
+                 probes: int = 10, budget_ms: float = 50.0):
+    """
+    mode=observed ranks observed trajectories (the fast baseline);
+    mode=vector extrapolates via the embedding ANN index, so concepts with no
+    trajectories still get predictions; mode=blend mixes both with alpha.
+    """
+    if mode not in ("observed", "vector", "blend"):
+        raise HTTPException(400, "mode must be observed, vector or blend")
+    # hot keys are answered from the in-process caches without touching the pool;
+    # vector results also depend on neighbours' trajectories, so they rely on the TTL
+    cache_key = (mode, k) if mode == "observed" else (mode, k, alpha, probes)
+    hit = cache.CONCEPTS.get(key)
+    if hit is not None:
+        cached = cache.PREDICTIONS.get((hit[0], *cache_key))
+        if cached is not None:
+            return {"predictions": cached}
+    with db.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        concepts = {key: hit} if hit is not None else _lookup_concepts(cur, [key], cached=False)
+        if key not in concepts: return {"predictions": []}
+        source_id = concepts[key][0]
+        observed = []
+        if mode != "vector":
+            with metrics.query("predict_observed"):
+                observed = predict.observed_next(cur, source_id, k)
+        if mode == "observed":
+            predictions = observed
+        else:
+            with metrics.query("predict_vector"):
+                extrapolated = predict.vector_next(conn, source_id, k, probes=probes, budget_ms=budget_ms)
+            if extrapolated is None:
+                # over budget: answer with what we have, uncached
+                return {"predictions": predict.blend_predictions(observed, [], k, 1.0), "degraded": True}
+            predictions = predict.blend_predictions(observed, extrapolated, k, 0.0 if mode == "vector" else alpha)
+    cache.PREDICTIONS.put((source_id, *cache_key), predictions)
+    return {"predictions": predictions}
+
+@app.get("/predict/path/{key}")
+def predict_path(key: str, depth: int = 3, beam: int = 5, k: int = 5, budget_ms: float = 200.0):
+    """Roll out the k most likely multi-step paths from key (beam search over trajectory)."""
+    depth = max(1, min(depth, 12))
+    beam = max(1, min(beam, 100))
+    with db.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        concepts = _lookup_concepts(cur, [key])
+        if key not in concepts: return {"paths": [], "truncated": False}
+        return predict.beam_paths(cur, concepts[key][0], key, depth=depth, beam=beam, k=k, budget_ms=budget_ms)
 
 class IngestBody(BaseModel):
     domain: str
@@ -186,31 +339,22 @@ class IngestBody(BaseModel):
 def ingest_text(body: IngestBody):
     sents = sentence_split(body.text)
     if not sents:
-        return {"ok": True, "sentences": 0, "channel": body.channel}
+        return {"ok": True, "sentences": 0, "channels": body.channels}
 
     session_id = body.session_id or default_session_id(body.domain)
-    used_channels = None if (body.channel in (None, "", "all")) else [body.channel]
-
-    with psycopg.connect(DB_URL, row_factory=dict_row) as conn:
-        prev_by_channel: Dict[str, int] = {}
-        total_moves = 0
-        total_edges = 0
-
-        for i, sent in enumerate(sents):
-            out = ingest_one_text(
-                conn,
-                sent,
-                session_id=session_id,
-                domain=body.domain,
-                used_channels=used_channels,
-                span={"sent": i, "ingest_source": "ingest_text"},
-                prev_by_channel=prev_by_channel,
-            )
-            prev_by_channel = out["prev_by_channel"]
-            total_moves += out["moves"]
-            total_edges += out["edges"]
-
-        conn.commit()
+    used_channels = None if (not body.channels or "all" in body.channels) else body.channels
+
+    with db.connection(row_factory=dict_row) as conn:
+        out = ingest_texts(
+            conn,
+            sents,
+            session_id=session_id,
+            domain=body.domain,
+            used_channels=used_channels,
+            spans=[{"sent": i, "ingest_source": "ingest_text"} for i in range(len(sents))],
+        )
+        with metrics.query("ingest_commit"):
+            conn.commit()
 
     return {
         "ok": True,
@@ -218,18 +362,132 @@ def ingest_text(body: IngestBody):
         "session_id": session_id,
         "sentences": len(sents),
         "channels": used_channels,
-        "moves": total_moves,
-        "edges": total_edges
+        "moves": out["moves"],
+        "edges": out["edges"]
     }
 
+class _ProgressStream(StreamingResponse):
+    """
+    StreamingResponse without the concurrent disconnect listener, which would
+    otherwise compete with the handler for the request body it is still
+    reading.
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl")
+
+@app.post("/ingest_stream")
+async def ingest_stream(
+    request: Request,
+    domain: str,
+    session_id: Optional[str] = None,
+    channels: Optional[str] = None,     # comma-separated; None → all
+    batch_size: int = 200,
+):
+    """
+    Ingest an arbitrarily large text from a chunked body.
+
+    The body is either plain text or, with Content-Type application/x-ndjson
+    or application/jsonl, NDJSON whose lines are strings or objects with a
+    "text" field; sentences may straddle chunk or line boundaries. Sentences
+    are written in batches of batch_size, each batch committed on its own
+    connection, and one NDJSON progress line is streamed back per batch. A
+    malformed NDJSON line ends the stream with an ok=false line naming it.
+    """
+    session_id = session_id or default_session_id(domain)
+    used_channels = None if not channels or channels == "all" else [c.strip() for c in channels.split(",") if c.strip()]
+    media_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+    ndjson = media_type in NDJSON_MEDIA_TYPES
+    lines_seen = {"n": 0}
+
+    def write_batch(sents, first_idx, state):
+        # runs in the threadpool; the connection is held for one batch, not the whole upload
+        with db.connection(row_factory=dict_row) as conn:
+            out = ingest_texts(
+                conn,
+                sents,
+                session_id=session_id,
+                domain=domain,
+                used_channels=used_channels,
+                spans=[{"sent": first_idx + i, "ingest_source": "ingest_stream"} for i in range(len(sents))],
+                prev_by_channel=state.get("prev_by_channel"),
+                prev_vec_by_channel=state.get("prev_vec_by_channel"),
+            )
+            with metrics.query("ingest_commit"):
+                conn.commit()
+        state["prev_by_channel"] = out["prev_by_channel"]
+        state["prev_vec_by_channel"] = out["prev_vec_by_channel"]
+        return out
+
+    async def texts():
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+        async for chunk in request.stream():
+            text = decoder.decode(chunk)
+            if not ndjson:
+                yield text
+                continue
+            pending += text
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                lines_seen["n"] += 1
+                if line.strip():
+                    obj = json.loads(line)
+                    yield ((obj.get("text") or "") if isinstance(obj, dict) else str(obj)) + " "
+        tail = decoder.decode(b"", final=True)
+        if ndjson:
+            pending += tail
+            if pending.strip():
+                lines_seen["n"] += 1
+                obj = json.loads(pending)
+                yield (obj.get("text") or "") if isinstance(obj, dict) else str(obj)
+        elif tail:
+            yield tail
+
+    async def progress():
+        splitter = SentenceBuffer()
+        state: Dict[str, Any] = {}
+        batch: List[str] = []
+        totals = {"sentences": 0, "moves": 0, "edges": 0}
+
+        async def flush():
+            out = await run_in_threadpool(write_batch, list(batch), totals["sentences"], state)
+            totals["sentences"] += len(batch)
+            totals["moves"] += out["moves"]
+            totals["edges"] += out["edges"]
+            batch.clear()
+            return json.dumps({"session_id": session_id, **totals}) + "\n"
+
+        try:
+            async for text in texts():
+                for sent in splitter.feed(text):
+                    batch.append(sent)
+                    if len(batch) >= batch_size:
+                        yield await flush()
+        except json.JSONDecodeError as exc:
+            # the 200 and earlier batches are already out; end the stream with the error instead of truncating it
+            yield json.dumps({"ok": False, "error": f"invalid NDJSON: {exc}", "line": lines_seen["n"],
+                              "session_id": session_id, **totals}) + "\n"
+            return
+        batch.extend(splitter.flush())
+        if batch:
+            yield await flush()
+        yield json.dumps({"ok": True, "done": True, "domain": domain, "session_id": session_id,
+                          "channels": used_channels, **totals}) + "\n"
+
+    return _ProgressStream(progress(), media_type="application/x-ndjson")
+
 @app.post("/ingest_unit")
 def ingest_unit(body: dict):
+    if body.pop("background", False):
+        return _enqueue("ingest_unit", body)
     unit_path = body["unit_path"]
     depth     = body.get("depth")           # e.g., "subtitle"
     channels  = body.get("channels")        # None => all
     wild = any(ch in unit_path for ch in "*?[]|{}")
 
-    with psycopg.connect(DB_URL, row_factory=dict_row) as conn, conn.cursor() as cur:
+    with db.connection(row_factory=dict_row) as conn, conn.cursor() as cur:
         if depth:
             if wild:
                 cur.execute("""
@@ -256,28 +514,20 @@ def ingest_unit(body: dict):
                 """, (unit_path,))
 
         rows = cur.fetchall()
-
-        prev_by_channel: Dict[str, int] = {}
-        total_moves = 0
-        total_edges = 0
-
-        for r in rows:
-            out = ingest_one_text(
-                conn,
-                r["text"] or "",
-                session_id=r["path"],                 # session id tied to unit path
-                domain=r["domain"],
-                used_channels=channels,
-                span={"unit_id": r["id"], "kind": r["kind"], "label": r["label"]},
-                prev_by_channel=prev_by_channel,
-            )
-            prev_by_channel = out["prev_by_channel"]
-            total_moves += out["moves"]
-            total_edges += out["edges"]
+        report_progress(0, len(rows), "channelize", force=True)
+
+        out = ingest_texts(
+            conn,
+            [r["text"] or "" for r in rows],
+            session_id=[r["path"] for r in rows],   # session id tied to unit path
+            domain=[r["domain"] for r in rows],
+            used_channels=channels,
+            spans=[{"unit_id": r["id"], "kind": r["kind"], "label": r["label"]} for r in rows],
+        )
 
         conn.commit()
 
-    return {"ok": True, "ingested": len(rows), "moves": total_moves, "edges": total_edges}
+    return {"ok": True, "ingested": len(rows), "moves": out["moves"], "edges": out["edges"]}
 
 
 def to_int(x): 
@@ -307,6 +557,8 @@ def build_path(
 
 @app.post("/xml/explode")
 def xml_explode(body: dict):
+    if body.pop("background", False):
+        return _enqueue("xml_explode", body)
     domain = body["domain"]
     doc_key = body["doc_key"]
     rules = body.get("rules", {})
@@ -315,105 +567,9 @@ def xml_explode(body: dict):
     if not unit_rules:
         return {"ok": False, "error": "rules.units is required"}
 
-    namespaces = rules.get("namespaces") or None
-    root_path = rules.get("root_path", "/")
-    default_path_scheme = rules.get("path_scheme")
-    path_prefix_default = rules.get("path_prefix")
     clear_existing = rules.get("clear_existing", True)
-
-    def _xpath(node, expr):
-        return node.xpath(expr, namespaces=namespaces) if namespaces else node.xpath(expr)
-
-    def _coerce_value(val):
-        if val is None:
-            return None
-        if isinstance(val, etree._Element):
-            text = val.text or ""
-            return text.strip() or None
-        if isinstance(val, bytes):
-            return val.decode("utf-8").strip() or None
-        text = str(val).strip()
-        return text or None
-
-    def _collect(node, expr):
-        result = _xpath(node, expr)
-        if isinstance(result, list):
-            out = []
-            for item in result:
-                coerced = _coerce_value(item)
-                if coerced:
-                    out.append(coerced)
-            return out
-        coerced = _coerce_value(result)
-        return [coerced] if coerced else []
-
-    def _first(node, expr):
-        vals = _collect(node, expr)
-        return vals[0] if vals else None
-
-    def _looks_like_xpath(expr: str) -> bool:
-        return expr.startswith((
-            "@",
-            "./",
-            "../",
-            ".//",
-            "//",
-            "normalize-space",
-            "string(",
-            "concat(",
-            "name(",
-        ))
-
-    def _resolve_meta(node, spec):
-        meta = {}
-        for key, expr in (spec or {}).items():
-            val = None
-            if isinstance(expr, str) and _looks_like_xpath(expr):
-                val = _first(node, expr)
-            elif callable(expr):
-                val = expr(node)
-            else:
-                val = expr
-            if val not in (None, ""):
-                meta[key] = val
-        return meta
-
-    def _resolve_label(node, spec):
-        if spec.get("label_path"):
-            label = _first(node, spec["label_path"])
-            if label:
-                return label
-        label_attr = spec.get("label_attr")
-        if label_attr:
-            attr = label_attr[1:] if label_attr.startswith("@") else label_attr
-            label_val = node.get(attr)
-            if label_val:
-                label_val = label_val.strip()
-                if label_val:
-                    return label_val
-        return None
-
-    def _resolve_ordinal(node, spec, counters):
-        ordinal_expr = spec.get("ordinal_path") or spec.get("ordinal")
-        ordinal = None
-        if ordinal_expr is not None:
-            if isinstance(ordinal_expr, str) and _looks_like_xpath(ordinal_expr):
-                ordinal = to_int(_first(node, ordinal_expr))
-            else:
-                ordinal = to_int(ordinal_expr)
-        if ordinal is None:
-            counters[spec["kind"]] += 1
-            ordinal = counters[spec["kind"]]
-        else:
-            counters[spec["kind"]] = max(counters[spec["kind"]], ordinal)
-        return ordinal
-
-    def _resolve_text(node, spec):
-        text_path = spec.get("text_path") or "normalize-space(.)"
-        vals = _collect(node, text_path)
-        if vals:
-            return " ".join(vals)
-        return None
+    compiled = compile_rules(rules)
+    root_path = compiled.root_path
 
     def _sanitize_token(token: str) -> str:
         cleaned = re.sub(r"[^A-Za-z0-9_]+", "_", token).strip("_")
@@ -422,9 +578,9 @@ def xml_explode(body: dict):
     def _normalize_path(path: str) -> str:
         return ".".join(_sanitize_token(part) for part in path.split(".") if part)
 
-    def _resolve_path(node, spec, ordinal, meta, kind, label):
+    def _resolve_path(node, unit, ordinal, meta, kind, label):
         path = None
-        path_scheme = spec.get("path_scheme") or default_path_scheme
+        path_scheme = unit.path_scheme or compiled.path_scheme
         if path_scheme:
             try:
                 path = build_path(
@@ -438,23 +594,155 @@ def xml_explode(body: dict):
                 # fall back to defaults if formatting fails
                 path = None
 
-        if not path and spec.get("path_attr"):
-            attr = spec["path_attr"]
-            attr = attr[1:] if attr.startswith("@") else attr
-            attr_val = node.get(attr)
+        if not path and unit.path_attr:
+            attr_val = node.get(unit.path_attr)
             if attr_val:
-                prefix = spec.get("path_prefix") or path_prefix_default
+                prefix = unit.path_prefix or compiled.path_prefix
                 token = _sanitize_token(attr_val)
                 path = f"{prefix}.{token}" if prefix else token
 
         if not path:
-            prefix = spec.get("path_prefix") or path_prefix_default or kind
-            pad = int(spec.get("path_pad", 3))
+            prefix = unit.path_prefix or compiled.path_prefix or kind
+            pad = unit.path_pad
             path = f"{prefix}.{ordinal:0{pad}d}" if prefix else f"{ordinal:0{pad}d}"
 
         return _normalize_path(path)
 
-    with psycopg.connect(DB_URL, row_factory=dict_row) as conn, conn.cursor() as cur:
+    def _explode_streaming(cur, xml_bytes):
+        """
+        iterparse-driven variant of the loop below for rules with stream=true.
+
+        Units are resolved as their elements close, doc_unit ids are reserved
+        from the sequence up front so children can point at still-open
+        parents, and rows are written in batches of rules.batch_size. A closed
+        subtree is cleared once no matched unit encloses it, so memory is
+        bounded by the largest top-level unit rather than the document.
+        Expressions that look outside a unit's own subtree or ancestors (for
+        example preceding siblings) are not supported in this mode.
+        """
+        specs_by_tag = defaultdict(list)
+        for unit in compiled.units:
+            if unit.stream_tag is None:
+                return {"ok": False, "error": f"stream mode needs plain tag paths, got '{unit.spec['path']}'"}
+            specs_by_tag[unit.stream_tag].append(unit)
+        if root_path not in ("/", ".", "./"):
+            return {"ok": False, "error": "stream mode does not support root_path"}
+
+        if clear_existing:
+            cur.execute(
+                "DELETE FROM doc_unit WHERE domain=%s AND doc_key=%s",
+                (domain, doc_key),
+            )
+
+        batch_size = int(rules.get("batch_size", 500))
+        counters = defaultdict(int)
+        inserted_by_kind = defaultdict(int)
+        reserved: List[int] = []
+        open_units = []     # (node, unit_id, kind, spec) for matched elements not yet closed
+        rows = []           # buffered doc_unit rows
+        links = []          # (child_id, parent_id) where the parent row is not written yet
+
+        def next_id():
+            if not reserved:
+                cur.execute(
+                    "SELECT nextval(pg_get_serial_sequence('doc_unit', 'id')) AS id FROM generate_series(1, %s)",
+                    (batch_size,),
+                )
+                reserved.extend(sorted((r["id"] for r in cur.fetchall()), reverse=True))
+            return reserved.pop()
+
+        def add_row(unit_id, kind, label, path, ordinal, text, meta, parent_id=None):
+            if parent_id is not None and any(parent_id == u[1] for u in open_units):
+                links.append((unit_id, parent_id))
+                parent_id = None
+            rows.append((unit_id, domain, doc_key, kind, label, path, ordinal, text, Json(meta or {}), parent_id))
+            inserted_by_kind[kind] += 1
+
+        def flush():
+            if rows:
+                with metrics.query("doc_unit_insert"):
+                    cur.executemany(
+                        """
+                          INSERT INTO doc_unit (id, domain, doc_key, kind, label, path, ordinal, text, meta, parent_id)
+                          VALUES (%s,%s,%s,%s,%s,%s::ltree,%s,%s,%s,%s)
+                        """,
+                        rows,
+                    )
+                rows.clear()
+            open_ids = {u[1] for u in open_units}
+            ready = [link for link in links if link[1] not in open_ids]
+            if ready:
+                cur.execute(
+                    """
+                      UPDATE doc_unit d SET parent_id = u.p
+                      FROM unnest(%s::bigint[], %s::bigint[]) AS u(c, p)
+                      WHERE d.id = u.c
+                    """,
+                    ([c for c, _ in ready], [p for _, p in ready]),
+                )
+                links[:] = [link for link in links if link[1] in open_ids]
+
+        for event, node in etree.iterparse(io.BytesIO(xml_bytes), events=("start", "end")):
+            specs = specs_by_tag.get(etree.QName(node).localname)
+            if event == "start":
+                for unit in specs or ():
+                    open_units.append((node, next_id(), unit.kind, unit))
+                continue
+
+            if specs:
+                mine = [u for u in open_units if u[0] is node]
+                del open_units[-len(mine):]
+                open_by_node = {u[0]: u[1] for u in open_units}
+                for _, unit_id, kind, unit in mine:
+                    label = unit.label(node)
+                    meta = unit.meta_for(node)
+                    ordinal = unit.ordinal(node, counters)
+                    text = unit.text(node)
+                    path = _resolve_path(node, unit, ordinal, meta, kind, label)
+
+                    parent_id = None
+                    if unit.parent_xpath is not None:
+                        for candidate in unit.parent_xpath(node):
+                            parent_id = open_by_node.get(candidate)
+                            if parent_id:
+                                break
+                    if parent_id is None and unit.parent_kinds:
+                        for _, anc_id, anc_kind, _ in reversed(open_units):
+                            if anc_kind in unit.parent_kinds:
+                                parent_id = anc_id
+                                break
+                    if parent_id is None and unit.inherit_parent:
+                        parent_id = open_by_node.get(node.getparent())
+
+                    add_row(unit_id, kind, label, path, ordinal, text, meta, parent_id)
+
+                    for child_kind in unit.sentence_children:
+                        if text:
+                            for j, sent in enumerate(sentence_split(text), start=1):
+                                add_row(
+                                    next_id(),
+                                    child_kind,
+                                    f"{label or kind}-{j}",
+                                    _normalize_path(f"{path}.{j:03d}"),
+                                    j,
+                                    sent,
+                                    {},
+                                    parent_id=unit_id,
+                                )
+
+            if not open_units:
+                node.clear(keep_tail=True)
+                parent = node.getparent()
+                while parent is not None and node.getprevious() is not None:
+                    del parent[0]
+            if len(rows) >= batch_size:
+                flush()
+                report_progress(sum(inserted_by_kind.values()), None, "explode")
+
+        flush()
+        return {"ok": True, "inserted": sum(inserted_by_kind.values()), "by_kind": dict(inserted_by_kind)}
+
+    with db.connection(row_factory=dict_row) as conn, conn.cursor() as cur:
         cur.execute(
             "SELECT id, xml_payload FROM corpus_xml WHERE doc_key=%s AND domain=%s",
             (doc_key, domain),
@@ -470,13 +758,24 @@ def xml_explode(body: dict):
             xml_bytes = payload.tobytes()
         else:
             xml_bytes = bytes(payload)
+        del payload, row
+
+        if rules.get("stream"):
+            try:
+                result = _explode_streaming(cur, xml_bytes)
+            except etree.XMLSyntaxError as exc:
+                conn.rollback()
+                return {"ok": False, "error": f"invalid xml: {exc}"}
+            if result["ok"]:
+                conn.commit()
+            return result
 
         try:
             xml_root = etree.fromstring(xml_bytes)
         except etree.XMLSyntaxError as exc:
             return {"ok": False, "error": f"invalid xml: {exc}"}
 
-        roots = _xpath(xml_root, root_path)
+        roots = compiled.root(xml_root)
         if not roots:
             # allow the document root itself if the path resolves to the root
             if root_path in ("/", ".", "./"):
@@ -496,73 +795,78 @@ def xml_explode(body: dict):
         inserted_by_kind = defaultdict(int)
 
         def insert_unit(kind, label, path, ordinal, text, meta, parent_id=None):
-            cur.execute(
-                """
-                  INSERT INTO doc_unit (domain, doc_key, kind, label, path, ordinal, text, meta, parent_id)
-                  VALUES (%s,%s,%s,%s,%s::ltree,%s,%s,%s,%s)
-                  RETURNING id
-                """,
-                (domain, doc_key, kind, label, path, ordinal, text, Json(meta or {}), parent_id),
-            )
+            with metrics.query("doc_unit_insert"):
+                cur.execute(
+                    """
+                      INSERT INTO doc_unit (domain, doc_key, kind, label, path, ordinal, text, meta, parent_id)
+                      VALUES (%s,%s,%s,%s,%s::ltree,%s,%s,%s,%s)
+                      RETURNING id
+                    """,
+                    (domain, doc_key, kind, label, path, ordinal, text, Json(meta or {}), parent_id),
+                )
+                unit_id = cur.fetchone()["id"]
             inserted_by_kind[kind] += 1
-            return cur.fetchone()["id"]
+            return unit_id
 
         for root in roots:
-            for spec in unit_rules:
-                kind = spec["kind"]
-                nodes = _xpath(root, spec["path"])
-                for node in nodes:
-                    label = _resolve_label(node, spec)
-                    meta = _resolve_meta(node, spec.get("meta"))
-                    ordinal = _resolve_ordinal(node, spec, counters)
-                    text = _resolve_text(node, spec)
-                    path = _resolve_path(node, spec, ordinal, meta, kind, label)
+            for unit in compiled.units:
+                kind = unit.kind
+                # nodes are only looked up as parents by parent_xpath/inherit_parent
+                # or by a parent_kind naming this kind; skip the bookkeeping otherwise
+                track = compiled.any_inherit or kind in compiled.parent_kinds
+                for node in unit.select(root):
+                    label = unit.label(node)
+                    meta = unit.meta_for(node)
+                    ordinal = unit.ordinal(node, counters)
+                    text = unit.text(node)
+                    path = _resolve_path(node, unit, ordinal, meta, kind, label)
 
                     parent_id = None
-                    if spec.get("parent_xpath"):
-                        for candidate in _xpath(node, spec["parent_xpath"]):
+                    if unit.parent_xpath is not None:
+                        for candidate in unit.parent_xpath(node):
                             parent_id = ids_by_node.get(candidate)
                             if parent_id:
                                 break
-                    if parent_id is None and spec.get("parent_kind"):
-                        parent_kinds = spec["parent_kind"]
-                        if isinstance(parent_kinds, str):
-                            parent_kinds = [parent_kinds]
+                    if parent_id is None and unit.parent_kinds and kinds_by_node:
                         for ancestor in node.iterancestors():
-                            anc_id = ids_by_node.get(ancestor)
-                            if anc_id and kinds_by_node.get(ancestor) in parent_kinds:
-                                parent_id = anc_id
+                            if kinds_by_node.get(ancestor) in unit.parent_kinds:
+                                parent_id = ids_by_node[ancestor]
                                 break
-                    if parent_id is None and spec.get("inherit_parent"):
-                        ancestor = next(iter(node.iterancestors()), None)
-                        if ancestor is not None:
-                            parent_id = ids_by_node.get(ancestor)
+                    if parent_id is None and unit.inherit_parent:
+                        parent_id = ids_by_node.get(node.getparent())
 
                     unit_id = insert_unit(kind, label, path, ordinal, text, meta, parent_id)
-                    ids_by_node[node] = unit_id
-                    kinds_by_node[node] = kind
-
-                    if spec.get("children"):
-                        for child in spec["children"]:
-                            if child.get("split") == "sentence" and text:
-                                sentences = sentence_split(text)
-                                for j, sent in enumerate(sentences, start=1):
-                                    child_path = f"{path}.{j:03d}"
-                                    insert_unit(
-                                        child["kind"],
-                                        f"{label or kind}-{j}",
-                                        _normalize_path(child_path),
-                                        j,
-                                        sent,
-                                        {},
-                                        parent_id=unit_id,
-                                    )
+                    if track:
+                        ids_by_node[node] = unit_id
+                        kinds_by_node[node] = kind
+                    report_progress(sum(inserted_by_kind.values()), None, kind)
+
+                    for child_kind in unit.sentence_children:
+                        if text:
+                            sentences = sentence_split(text)
+                            for j, sent in enumerate(sentences, start=1):
+                                child_path = f"{path}.{j:03d}"
+                                insert_unit(
+                                    child_kind,
+                                    f"{label or kind}-{j}",
+                                    _normalize_path(child_path),
+                                    j,
+                                    sent,
+                                    {},
+                                    parent_id=unit_id,
+                                )
 
         conn.commit()
 
     total = sum(inserted_by_kind.values())
     return {"ok": True, "inserted": total, "by_kind": dict(inserted_by_kind)}
 
+try:   # optional fast JSON decoder for /jsonl/explode
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 # --- helper: safe int ---
 def _to_int(x):
     try: return int(x)
@@ -583,6 +887,8 @@ def jsonl_explode(body: dict):
       }
     }
     """
+    if body.pop("background", False):
+        return _enqueue("jsonl_explode", body)
     domain = body["domain"]
     doc_key = body["doc_key"]
     rules = body.get("rules", {})
@@ -590,27 +896,52 @@ def jsonl_explode(body: dict):
     gap_sec = int(rules.get("scene_gap_seconds", 45))
     boundary_re = re.compile(rules.get("boundary_shot_regex", r"^\Z"))  # default no matches
 
-    with psycopg.connect(DB_URL, row_factory=dict_row) as conn, conn.cursor() as cur:
-        # 1) fetch raw JSONL text
-        cur.execute(
-            "SELECT payload FROM corpus_jsonl WHERE domain=%s AND doc_key=%s",
-            (domain, doc_key)
-        )
+    batch_size = int(rules.get("batch_size", 1000))
+    t0 = time.perf_counter()
+
+    with db.connection(row_factory=dict_row) as conn, conn.cursor() as cur:
+        # 1) size the payload; lines are then streamed from a server-side cursor
+        cur.execute("""
+          SELECT id, length(payload) - length(replace(payload, E'\\n', '')) + 1 AS n_lines
+          FROM corpus_jsonl WHERE domain=%s AND doc_key=%s
+        """, (domain, doc_key))
         row = cur.fetchone()
         if not row:
             return {"ok": False, "error": "corpus_jsonl not found"}
+        src_id, n_lines = row["id"], row["n_lines"]
+
+        # 2) buffered writes: ids come from the sequence in blocks, so scene ids are
+        #    known before their rows are written and children never wait on RETURNING
+        reserved: List[int] = []
+        rows = []
+        inserted_by_kind = defaultdict(int)
 
-        payload = row["payload"]
-        lines = [ln for ln in payload.splitlines() if ln.strip()]
+        def next_id():
+            if not reserved:
+                cur.execute(
+                    "SELECT nextval(pg_get_serial_sequence('doc_unit', 'id')) AS id FROM generate_series(1, %s)",
+                    (batch_size,),
+                )
+                reserved.extend(sorted((r["id"] for r in cur.fetchall()), reverse=True))
+            return reserved.pop()
+
+        def flush():
+            if not rows:
+                return
+            with metrics.query("doc_unit_insert"), cur.copy(
+                "COPY doc_unit (id, domain, doc_key, kind, label, path, ordinal, text, meta, parent_id) FROM STDIN"
+            ) as copy:
+                for r in rows:
+                    copy.write_row(r)
+            rows.clear()
 
-        # 2) insertion helper
         def insert_unit(kind, label, path, ordinal, text, meta, parent_id=None):
-            cur.execute("""
-              INSERT INTO doc_unit (domain, doc_key, kind, label, path, ordinal, text, meta, parent_id)
-              VALUES (%s,%s,%s,%s,%s::ltree,%s,%s,%s,%s)
-              RETURNING id
-            """, (domain, doc_key, kind, label, path, ordinal, text, Json(meta or {}), parent_id))
-            return cur.fetchone()["id"]
+            unit_id = next_id()
+            rows.append((unit_id, domain, doc_key, kind, label, path, ordinal, text, Json(meta or {}), parent_id))
+            inserted_by_kind[kind] += 1
+            if len(rows) >= batch_size:
+                flush()
+            return unit_id
 
         scene_idx = 0
         scene_id = None
@@ -634,93 +965,107 @@ def jsonl_explode(body: dict):
             return f"{path_prefix}.S{scene_idx:03d}"
 
         # 3) pass through rows and emit units
-        for raw in lines:
-            try:
-                obj = json.loads(raw)
-            except json.JSONDecodeError:
-                # Skip malformed lines (or log)
-                continue
-
-            ptype = obj.get("panel_type")
-            # bootstrap first scene if needed
-            if scene_id is None:
-                scene_id = new_scene({"bootstrap": True})
-
-            # boundary by explicit scene (rare) or by shot text regex or by subtitle time gap
-            boundary = False
-
-            if ptype == "camera_shot":
-                txt = (obj.get("text") or "").strip()
-                if boundary_re.search(txt):
-                    boundary = True
-
-            if ptype == "subtitle":
-                secs = obj.get("seconds_in")
-                # Some rows may have seconds as string; coerce
+        with conn.cursor(name="jsonl_explode_lines") as lines:
+            lines.itersize = 2000
+            lines.execute("""
+              SELECT l.line
+              FROM corpus_jsonl c, regexp_split_to_table(c.payload, E'\\r?\\n') AS l(line)
+              WHERE c.id = %s AND l.line ~ '\\S'
+            """, (src_id,))
+            for line_no, line_row in enumerate(lines):
+                report_progress(line_no, n_lines, "explode")
                 try:
-                    secs = float(secs) if secs is not None else None
-                except:
-                    secs = None
-                if last_sub_secs is not None and secs is not None:
-                    if (secs - last_sub_secs) > gap_sec:
+                    obj = _json_loads(line_row["line"])
+                except ValueError:
+                    # Skip malformed lines (or log)
+                    continue
+                if not isinstance(obj, dict):
+                    continue
+
+                ptype = obj.get("panel_type")
+                # bootstrap first scene if needed
+                if scene_id is None:
+                    scene_id = new_scene({"bootstrap": True})
+
+                # boundary by explicit scene (rare) or by shot text regex or by subtitle time gap
+                boundary = False
+
+                if ptype == "camera_shot":
+                    txt = (obj.get("text") or "").strip()
+                    if boundary_re.search(txt):
                         boundary = True
-                if secs is not None:
-                    last_sub_secs = secs
-
-            if boundary:
-                scene_id = new_scene({"boundary": True})
-
-            scene_path = get_scene_path()
-
-            if ptype == "camera_shot":
-                shot_counters[scene_idx] += 1
-                shot_no = shot_counters[scene_idx]
-                shot_label = obj.get("shot_id") or f"shot_{shot_no:03d}"
-                shot_path = f"{scene_path}.{shot_label}"
-                meta = {
-                    "page": obj.get("page"),
-                    "shot_id": obj.get("shot_id"),
-                    "text": obj.get("text")
-                }
-                insert_unit("shot", shot_label, shot_path, shot_no, obj.get("text"), meta, parent_id=scene_id)
-
-            elif ptype == "scene_unit":
-                act_counters[scene_idx] += 1
-                k = act_counters[scene_idx]
-                act_path = f"{scene_path}.act_{k:04d}"
-                meta = {
-                    "page": obj.get("page"),
-                    "matched": obj.get("matched"),
-                    "camera_shot": obj.get("camera_shot"),
-                    "seconds_in": obj.get("seconds_in")
-                }
-                insert_unit("action", f"act_{k:04d}", act_path, k, obj.get("text"), meta, parent_id=scene_id)
-
-            elif ptype == "subtitle":
-                sub_counters[scene_idx] += 1
-                k = sub_counters[scene_idx]
-                sub_path = f"{scene_path}.sub_{k:04d}"
-                meta = {
-                    "time": obj.get("time"),
-                    "seconds_in": obj.get("seconds_in"),
-                    "camera_shot": obj.get("camera_shot"),
-                    "subtitle_anchor": obj.get("subtitle_anchor")
-                }
-                insert_unit("subtitle", f"sub_{k:04d}", sub_path, k, obj.get("text"), meta, parent_id=scene_id)
-
-            elif ptype == "scene":
-                # If you ever include explicit scene rows, you can stuff synopsis/etc. here.
-                # For now, treat as a soft boundary that's already handled by the regex/gap triggers.
-                pass
-
-            elif ptype == "meta":
-                # ignore; could stash into doc-level meta later
-                pass
-
-            else:
-                # unknown panel types ignored
-                pass
 
+                if ptype == "subtitle":
+                    secs = obj.get("seconds_in")
+                    # Some rows may have seconds as string; coerce
+                    try:
+                        secs = float(secs) if secs is not None else None
+                    except:
+                        secs = None
+                    if last_sub_secs is not None and secs is not None:
+                        if (secs - last_sub_secs) > gap_sec:
+                            boundary = True
+                    if secs is not None:
+                        last_sub_secs = secs
+
+                if boundary:
+                    scene_id = new_scene({"boundary": True})
+
+                scene_path = get_scene_path()
+
+                if ptype == "camera_shot":
+                    shot_counters[scene_idx] += 1
+                    shot_no = shot_counters[scene_idx]
+                    shot_label = obj.get("shot_id") or f"shot_{shot_no:03d}"
+                    shot_path = f"{scene_path}.{shot_label}"
+                    meta = {
+                        "page": obj.get("page"),
+                        "shot_id": obj.get("shot_id"),
+                        "text": obj.get("text")
+                    }
+                    insert_unit("shot", shot_label, shot_path, shot_no, obj.get("text"), meta, parent_id=scene_id)
+
+                elif ptype == "scene_unit":
+                    act_counters[scene_idx] += 1
+                    k = act_counters[scene_idx]
+                    act_path = f"{scene_path}.act_{k:04d}"
+                    meta = {
+                        "page": obj.get("page"),
+                        "matched": obj.get("matched"),
+                        "camera_shot": obj.get("camera_shot"),
+                        "seconds_in": obj.get("seconds_in")
+                    }
+                    insert_unit("action", f"act_{k:04d}", act_path, k, obj.get("text"), meta, parent_id=scene_id)
+
+                elif ptype == "subtitle":
+                    sub_counters[scene_idx] += 1
+                    k = sub_counters[scene_idx]
+                    sub_path = f"{scene_path}.sub_{k:04d}"
+                    meta = {
+                        "time": obj.get("time"),
+                        "seconds_in": obj.get("seconds_in"),
+                        "camera_shot": obj.get("camera_shot"),
+                        "subtitle_anchor": obj.get("subtitle_anchor")
+                    }
+                    insert_unit("subtitle", f"sub_{k:04d}", sub_path, k, obj.get("text"), meta, parent_id=scene_id)
+
+                elif ptype == "scene":
+                    # If you ever include explicit scene rows, you can stuff synopsis/etc. here.
+                    # For now, treat as a soft boundary that's already handled by the regex/gap triggers.
+                    pass
+
+                elif ptype == "meta":
+                    # ignore; could stash into doc-level meta later
+                    pass
+
+                else:
+                    # unknown panel types ignored
+                    pass
+
+        flush()
         conn.commit()
 
-    return {"ok": True, "scenes": scene_idx}
+    elapsed = time.perf_counter() - t0
+    total = sum(inserted_by_kind.values())
+    return {"ok": True, "scenes": scene_idx, "inserted": total, "by_kind": dict(inserted_by_kind),
+            "ms": round(elapsed * 1000.0, 1), "rows_per_s": round(total / elapsed, 1) if elapsed else None}
@@ -1,30 +1,56 @@
 # channelizers.py
-from typing import List, Tuple, Dict, Iterable
-import re, hashlib, struct
+from typing import List, Tuple, Dict, Iterable, Sequence
+import importlib, importlib.metadata, importlib.util, json, os, re, hashlib, threading
+
+import numpy as np
+
+from api.services import metrics
 
 EMB_DIM = 384
 
 def _pad(xs: List[float], n=EMB_DIM) -> List[float]:
     return xs[:n] + [0.0] * max(0, n - len(xs))
 
+def _pad_rows(rows: Sequence[Sequence[float]], n=EMB_DIM) -> np.ndarray:
+    """Stack short feature rows into a zero-padded (len(rows), n) float32 matrix."""
+    out = np.zeros((len(rows), n), dtype=np.float32)
+    if len(rows):
+        width = min(n, len(rows[0]))
+        out[:, :width] = np.asarray(rows, dtype=np.float32)[:, :width]
+    return out
+
 # ----- rhetoric (384-d cheap heuristic) -----
-def rhetoric_features(s: str) -> List[float]:
+RX_CONTRAST    = re.compile(r"\b(but|yet|however)\b")
+RX_CAUSAL      = re.compile(r"\b(so|therefore|thus)\b")
+RX_CONDITIONAL = re.compile(r"\bif\b")
+RX_NEGATION    = re.compile(r"\b(no|not|never|none)\b")
+RX_IMPERATIVE  = re.compile(r"^[a-z]+(?:\s+[a-z]+){0,2}\b")
+RX_FIRST       = re.compile(r"\bi\b")
+RX_SECOND      = re.compile(r"\byou\b")
+RX_COORD       = re.compile(r"\b(and|or)\b.*\b(and|or)\b")
+
+def _rhetoric_raw(s: str) -> List[float]:
     t = s.lower()
-    feats = [
-        1.0 if re.search(r"\b(but|yet|however)\b", t) else 0.0,   # contrast
-        1.0 if re.search(r"\b(so|therefore|thus)\b", t) else 0.0, # causal
-        1.0 if re.search(r"\bif\b", t) else 0.0,                  # conditional
-        1.0 if re.search(r"\b(no|not|never|none)\b", t) else 0.0, # negation
-        1.0 if re.match(r"^[a-z]+(?:\s+[a-z]+){0,2}\b", t) and t.endswith("!") else 0.0,  # imperative-ish
+    return [
+        1.0 if RX_CONTRAST.search(t) else 0.0,                    # contrast
+        1.0 if RX_CAUSAL.search(t) else 0.0,                      # causal
+        1.0 if RX_CONDITIONAL.search(t) else 0.0,                 # conditional
+        1.0 if RX_NEGATION.search(t) else 0.0,                    # negation
+        1.0 if RX_IMPERATIVE.match(t) and t.endswith("!") else 0.0,  # imperative-ish
         1.0 if "?" in t else 0.0,                                 # question
-        1.0 if re.search(r"\bi\b", t) and re.search(r"\byou\b", t) else 0.0, # pronoun mix
+        1.0 if RX_FIRST.search(t) and RX_SECOND.search(t) else 0.0, # pronoun mix
         min(1.0, t.count(",")/3.0),
         min(1.0, sum(c in ";:" for c in t)/2.0),
         min(1.0, sum(c in "'\"" for c in t)/2.0),
         min(1.0, len(t)/160.0),
-        1.0 if re.search(r"\b(and|or)\b.*\b(and|or)\b", t) else 0.0
+        1.0 if RX_COORD.search(t) else 0.0
     ]
-    return _pad(feats)
+
+def rhetoric_features(s: str) -> List[float]:
+    return _pad(_rhetoric_raw(s))
+
+def rhetoric_features_batch(texts: Sequence[str]) -> np.ndarray:
+    return _pad_rows([_rhetoric_raw(s) for s in texts])
 
 # ----- imagery (normalize buckets → 384-d) -----
 IMAGERY_BUCKETS = {
@@ -35,32 +61,206 @@ IMAGERY_BUCKETS = {
     "money":  ["gold","silver","coin","wealth","poor","debt","price"],
     "family": ["father","mother","son","daughter","friend","neighbor"],
 }
+_IMAGERY_WORDS = tuple(tuple(words) for words in IMAGERY_BUCKETS.values())
+
+def _imagery_counts(s: str) -> List[int]:
+    t = s.lower()
+    return [sum(t.count(w) for w in words) for words in _IMAGERY_WORDS]
+
 def imagery_features(s: str) -> List[float]:
-    t, vec = s.lower(), []
-    for _, words in IMAGERY_BUCKETS.items():
-        vec.append(sum(t.count(w) for w in words))
+    vec = _imagery_counts(s)
     norm = (sum(x*x for x in vec) ** 0.5) or 1.0
     vec = [x / norm for x in vec]
     return _pad(vec)
 
+def imagery_features_batch(texts: Sequence[str]) -> np.ndarray:
+    counts = np.asarray([_imagery_counts(s) for s in texts], dtype=np.float64).reshape(len(texts), len(_IMAGERY_WORDS))
+    norms = np.linalg.norm(counts, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0
+    return _pad_rows(counts / norms)
+
 # ----- lexico-semantic (stable 384-d from hash) -----
-def lexico_semantic(s: str) -> List[float]:
+# Each 64-byte blake2b digest yields 8 big-endian int64 words; the next digest
+# hashes the previous one. A text's whole chain is decoded with one frombuffer.
+_LEX_WORDS = 64 // 8
+_LEX_ROUNDS = -(-EMB_DIM // _LEX_WORDS)
+
+def _lexico_chain(s: str) -> bytes:
     h = hashlib.blake2b(s.encode("utf-8"), digest_size=64).digest()
-    vals: List[float] = []
-    while len(vals) < EMB_DIM:
-        for i in range(0, len(h), 8):
-            vals.append(abs(struct.unpack(">q", h[i:i+8])[0]) % 10_000 / 10_000.0)
-            if len(vals) == EMB_DIM: break
+    chain = [h]
+    for _ in range(_LEX_ROUNDS - 1):
         h = hashlib.blake2b(h, digest_size=64).digest()
-    return vals
+        chain.append(h)
+    return b"".join(chain)
 
-# ----- registry + runner -----
-CHANNELIZERS = {
-    "rhetoric": rhetoric_features,
-    "imagery": imagery_features,
-    "lexico_semantic": lexico_semantic,
-}
+def _lexico_values(buf: bytes, n: int) -> np.ndarray:
+    words = np.frombuffer(buf, dtype=">i8").reshape(n, -1)[:, :EMB_DIM]
+    # abs() through uint64 so that -2**63 maps to 2**63 exactly as Python's abs does
+    u = words.astype(np.uint64)
+    mag = np.where(words < 0, np.uint64(0) - u, u)
+    return (mag % np.uint64(10_000)).astype(np.float64) / 10_000.0
+
+def lexico_semantic(s: str) -> List[float]:
+    return _lexico_values(_lexico_chain(s), 1)[0].tolist()
+
+def lexico_semantic_batch(texts: Sequence[str]) -> np.ndarray:
+    if not texts:
+        return np.zeros((0, EMB_DIM), dtype=np.float32)
+    buf = b"".join(_lexico_chain(s) for s in texts)
+    return _lexico_values(buf, len(texts)).astype(np.float32)
+
+# ----- registry -----
+# Channelizers are registered as specs; "module:attr" targets are imported on
+# first use, so model-backed plugins cost nothing until a request names them.
+# Besides the built-ins below, specs come from the "pst.channelizers" entry
+# point group (each entry point resolves to a Channelizer) and from the JSON
+# file named by CHANNELIZERS_CONFIG:
+#   {"channels": [{"name": "...", "fn": "pkg.mod:embed", "batch": "pkg.mod:embed_batch",
+#                  "dim": 384, "version": "1", "default": false}]}
+ENTRY_POINT_GROUP = "pst.channelizers"
+
+def _resolve(target):
+    if not isinstance(target, str):
+        return target
+    module, _, attr = target.partition(":")
+    obj = importlib.import_module(module)
+    for part in attr.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+class Channelizer:
+    """
+    One channel: a scalar fn (text -> list of floats) and optionally a batch fn
+    (texts -> (n, EMB_DIM) float32). dim is how many leading dimensions the
+    channel fills; version tags its output (bump it whenever that changes).
+    Channels with default=False run only when asked for by name.
+    """
 
+    def __init__(self, name: str, fn=None, batch=None, *, dim: int = EMB_DIM, version: str = "1", default: bool = True):
+        if fn is None and batch is None:
+            raise ValueError(f"channelizer {name} needs fn or batch")
+        self.name = name
+        self.dim = int(dim)
+        self.version = str(version)
+        self.default = default
+        self._fn, self._batch = fn, batch
+        self._lock = threading.Lock()
+
+    @property
+    def batching(self) -> bool:
+        return self._batch is not None
+
+    def _load(self) -> None:
+        with self._lock:
+            self._fn, self._batch = _resolve(self._fn), _resolve(self._batch)
+
+    def __call__(self, text: str) -> List[float]:
+        if isinstance(self._fn, str) or isinstance(self._batch, str):
+            self._load()
+        if self._fn is None:
+            return _pad(self._batch([text])[0].tolist())
+        return _pad(list(self._fn(text)))
+
+    def batch(self, texts: Sequence[str]) -> np.ndarray:
+        if isinstance(self._fn, str) or isinstance(self._batch, str):
+            self._load()
+        if self._batch is None:
+            return _pad_rows([self._fn(t) for t in texts])
+        out = np.asarray(self._batch(texts), dtype=np.float32)
+        return out if out.shape[1:] == (EMB_DIM,) else _pad_rows(out)
+
+REGISTRY: Dict[str, Channelizer] = {}
+
+def register(spec: Channelizer) -> Channelizer:
+    REGISTRY[spec.name] = spec
+    return spec
+
+def channel_names(chosen: Iterable[str] | None = None) -> List[str]:
+    """Registered channels to run: the defaults, or the known names in chosen."""
+    if chosen is None:
+        return [name for name, spec in REGISTRY.items() if spec.default]
+    return [c for c in chosen if c in REGISTRY]
+
+def channel_version(channel: str) -> str:
+    return REGISTRY[channel].version
+
+register(Channelizer("rhetoric", rhetoric_features, rhetoric_features_batch, dim=12, version="1"))
+register(Channelizer("imagery", imagery_features, imagery_features_batch, dim=len(IMAGERY_BUCKETS), version="1"))
+register(Channelizer("lexico_semantic", lexico_semantic, lexico_semantic_batch, dim=EMB_DIM, version="1"))
+
+# local ONNX sentence embeddings (api/onnx_embedding.py); runs by default once a model is
+# configured and requirements-embedding.txt is installed, otherwise only when asked for
+_EMBED_DIR = os.getenv("EMBED_MODEL_DIR", "")
+_EMBED_DEPS = all(importlib.util.find_spec(m) is not None for m in ("onnxruntime", "tokenizers"))
+
+def embed_model_file(model_dir: str) -> str:
+    path = os.path.join(model_dir, "model_quantized.onnx")
+    return path if os.path.exists(path) else os.path.join(model_dir, "model.onnx")
+
+def embed_model_version(model_dir: str) -> str:
+    """Directory name plus a stamp of the .onnx file, so swapping the model invalidates cached vectors."""
+    if not model_dir:
+        return "unconfigured"
+    name = os.path.basename(os.path.normpath(model_dir))
+    path = embed_model_file(model_dir)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return name
+    stamp = f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}"
+    return f"{name}-{hashlib.sha1(stamp.encode()).hexdigest()[:12]}"
+
+register(Channelizer("semantic", batch="api.onnx_embedding:embed_batch", dim=EMB_DIM,
+                     version=embed_model_version(_EMBED_DIR),
+                     default=bool(_EMBED_DIR) and _EMBED_DEPS))
+
+def _discover() -> None:
+    try:
+        eps = importlib.metadata.entry_points(group=ENTRY_POINT_GROUP)
+    except Exception as exc:
+        print("channelizer entry points unavailable:", exc)
+        eps = ()
+    for ep in eps:
+        try:
+            register(ep.load())
+        except Exception as exc:
+            print(f"channelizer plugin {ep.name} failed to register:", exc)
+
+    path = os.getenv("CHANNELIZERS_CONFIG")
+    if path:
+        with open(path, encoding="utf-8") as fh:
+            for entry in json.load(fh).get("channels", []):
+                entry = dict(entry)
+                register(Channelizer(entry.pop("name"), entry.pop("fn", None), entry.pop("batch", None), **entry))
+
+_discover()
+
+# ----- storage -----
+# channels whose move.features / move_edge.delta are stored at their true width
+# (run db/sql/compact_channel_storage.sql first); pst_pad384() gives the 384-d view
+COMPACT_CHANNELS = {c.strip() for c in os.getenv("COMPACT_CHANNELS", "").split(",") if c.strip()}
+
+def storage_dim(channel: str) -> int:
+    spec = REGISTRY.get(channel)
+    return spec.dim if spec is not None and channel in COMPACT_CHANNELS else EMB_DIM
+
+# ----- runner -----
 def run_channels(text: str, chosen: Iterable[str] | None = None) -> Dict[str, List[float]]:
-    active = CHANNELIZERS if chosen is None else {c: CHANNELIZERS[c] for c in chosen if c in CHANNELIZERS}
-    return {ch: fn(text) for ch, fn in active.items()}
+    """Channelize one text; channels with a batch fn go through it."""
+    out = {}
+    for ch in channel_names(chosen):
+        spec = REGISTRY[ch]
+        with metrics.CHANNEL_SECONDS.time(ch):
+            out[ch] = spec.batch([text])[0].tolist() if spec.batching else spec(text)
+        metrics.CHANNEL_TEXTS.inc(1, ch)
+    return out
+
+def run_channels_batch(texts: Sequence[str], chosen: Iterable[str] | None = None) -> Dict[str, np.ndarray]:
+    """Channelize many texts at once; each channel maps to a (len(texts), EMB_DIM) float32 matrix."""
+    texts = list(texts)
+    out = {}
+    for ch in channel_names(chosen):
+        with metrics.CHANNEL_SECONDS.time(ch):
+            out[ch] = REGISTRY[ch].batch(texts)
+        metrics.CHANNEL_TEXTS.inc(len(texts), ch)
+    return out
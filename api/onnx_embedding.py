@@ -0,0 +1,113 @@
+# onnx_embedding.py
+"""
+Local sentence-embedding channel ("semantic") on CPU via onnxruntime.
+
+EMBED_MODEL_DIR must hold an exported sentence-transformer (model.onnx, or
+model_quantized.onnx when present, plus tokenizer.json), e.g.
+all-MiniLM-L6-v2, whose 384-d mean-pooled output matches move.features.
+Nothing here touches the network. onnxruntime and tokenizers are optional
+dependencies (api/requirements-embedding.txt), imported only when the
+channel is first used; without them the channel is not a default.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+import json, os, threading, time
+
+import numpy as np
+
+from api.channelizers import EMB_DIM, embed_model_file, embed_model_version
+
+MODEL_DIR = os.getenv("EMBED_MODEL_DIR", "")
+BATCH_SIZE = int(os.getenv("EMBED_BATCH", "64"))
+MAX_TOKENS = int(os.getenv("EMBED_MAX_TOKENS", "128"))
+THREADS = int(os.getenv("EMBED_THREADS", "0")) or min(4, os.cpu_count() or 1)   # process_corpus pool workers use 1
+SESSIONS = int(os.getenv("EMBED_SESSIONS", "1"))   # concurrent session.run calls
+LOG_BATCHES = os.getenv("EMBED_LOG", "0") == "1"     # print throughput per batch
+
+_LOCK = threading.Lock()
+_GATE = threading.BoundedSemaphore(SESSIONS)
+_MODEL: Optional[Dict[str, Any]] = None
+
+STATS = {"batches": 0, "sentences": 0, "seconds": 0.0}
+
+def model_version() -> str:
+    return embed_model_version(MODEL_DIR)
+
+def _load() -> Dict[str, Any]:
+    global _MODEL
+    with _LOCK:
+        if _MODEL is not None:
+            return _MODEL
+        if not MODEL_DIR:
+            raise RuntimeError("semantic channel needs EMBED_MODEL_DIR")
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as exc:
+            raise RuntimeError("semantic channel needs api/requirements-embedding.txt installed") from exc
+
+        path = embed_model_file(MODEL_DIR)
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = THREADS
+        opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+
+        tokenizer = Tokenizer.from_file(os.path.join(MODEL_DIR, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=MAX_TOKENS)
+        tokenizer.enable_padding()
+        _MODEL = {
+            "session": session,
+            "tokenizer": tokenizer,
+            "inputs": {i.name for i in session.get_inputs()},
+        }
+        return _MODEL
+
+def _run(model: Dict[str, Any], texts: List[str]) -> np.ndarray:
+    encs = model["tokenizer"].encode_batch(texts)
+    ids = np.asarray([e.ids for e in encs], dtype=np.int64)
+    mask = np.asarray([e.attention_mask for e in encs], dtype=np.int64)
+    feed = {"input_ids": ids, "attention_mask": mask}
+    if "token_type_ids" in model["inputs"]:
+        feed["token_type_ids"] = np.zeros_like(ids)
+    with _GATE:
+        out = model["session"].run(None, {k: v for k, v in feed.items() if k in model["inputs"]})[0]
+    if out.ndim == 3:   # token embeddings → mean pool over the attention mask
+        m = mask[:, :, None].astype(np.float32)
+        out = (out * m).sum(axis=1) / np.maximum(m.sum(axis=1), 1e-9)
+    out = out / np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+    return out.astype(np.float32)
+
+def embed_batch(texts: Sequence[str]) -> np.ndarray:
+    """(len(texts), EMB_DIM) float32 unit vectors; EMBED_LOG=1 prints throughput per batch."""
+    texts = list(texts)
+    result = np.zeros((len(texts), EMB_DIM), dtype=np.float32)
+    if not texts:
+        return result
+    model = _load()
+    # length-sorted batches keep padding (and wasted FLOPs) down
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for start in range(0, len(order), BATCH_SIZE):
+        idx = order[start:start + BATCH_SIZE]
+        t0 = time.perf_counter()
+        vecs = _run(model, [texts[i] for i in idx])
+        dt = time.perf_counter() - t0
+        width = min(EMB_DIM, vecs.shape[1])
+        result[idx, :width] = vecs[:, :width]
+        with _LOCK:
+            STATS["batches"] += 1
+            STATS["sentences"] += len(idx)
+            STATS["seconds"] += dt
+        if LOG_BATCHES:
+            print("embedding metrics:", json.dumps({
+                "batch": len(idx), "ms": round(dt * 1000.0, 1),
+                "sentences_per_s": round(len(idx) / dt, 1) if dt else None,
+            }))
+    return result
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        s = dict(STATS)
+    s["sentences_per_s"] = round(s["sentences"] / s["seconds"], 1) if s["seconds"] else None
+    s["model"] = model_version()
+    s["loaded"] = _MODEL is not None
+    return s
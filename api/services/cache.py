@@ -0,0 +1,167 @@
+"""In-process caches for hot read paths (concept lookups, predictions).
+
+Entries expire after a TTL and are also dropped eagerly: writers call the
+``invalidate_*`` helpers and publish the same invalidation on the
+``pst_cache`` NOTIFY channel, so every API process (and the worker, after a
+decay pass) can keep the others coherent. ``start_invalidation_listener``
+runs the LISTEN side in a daemon thread.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+import psycopg
+
+
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "10000"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+NOTIFY_CHANNEL = "pst_cache"
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe bounded LRU with a per-entry TTL and hit/miss counters."""
+
+    def __init__(self, name: str, maxsize: int = CACHE_MAXSIZE, ttl: float = CACHE_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] < now:
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def discard_where(self, pred) -> int:
+        with self._lock:
+            doomed = [k for k in self._data if pred(k)]
+            for k in doomed:
+                del self._data[k]
+            self.invalidations += len(doomed)
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._data)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# concept key -> (id, embedding)
+CONCEPTS = LRUCache("concepts")
+# (source_id, mode, k, ...) -> list of prediction rows
+PREDICTIONS = LRUCache("predictions")
+
+
+def invalidate_sources(source_ids: Iterable[int]) -> None:
+    ids = set(source_ids)
+    if ids:
+        PREDICTIONS.discard_where(lambda key: key[0] in ids)
+
+
+def invalidate_concepts(keys: Iterable[str]) -> None:
+    keys = set(keys)
+    if keys:
+        CONCEPTS.discard_where(lambda key: key in keys)
+
+
+def invalidate_all() -> None:
+    PREDICTIONS.clear()
+
+
+def _apply(payload: Dict[str, Any]) -> None:
+    if payload.get("all"):
+        invalidate_all()
+    invalidate_sources(payload.get("sources") or ())
+    invalidate_concepts(payload.get("concepts") or ())
+
+
+def publish(conn, *, sources: Iterable[int] = (), concepts: Iterable[str] = (), all: bool = False) -> None:
+    """
+    Invalidate locally and NOTIFY other processes; the notification is
+    delivered when conn's transaction commits.
+    """
+    payload: Dict[str, Any] = {"all": all, "sources": sorted(set(sources)), "concepts": sorted(set(concepts))}
+    _apply(payload)
+    text = json.dumps(payload)
+    if len(text) > 7000:   # NOTIFY payloads are capped at 8000 bytes
+        text = json.dumps({"all": True, "concepts": payload["concepts"][:100]})
+        if payload["concepts"][100:]:
+            CONCEPTS.clear()
+    conn.execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, text))
+
+
+def stats() -> Dict[str, Any]:
+    return {CONCEPTS.name: CONCEPTS.stats(), PREDICTIONS.name: PREDICTIONS.stats()}
+
+
+_LISTENER: Optional[threading.Thread] = None
+
+
+def start_invalidation_listener(dsn: str) -> None:
+    """LISTEN on pst_cache in a daemon thread; reconnects on failure."""
+    global _LISTENER
+    if _LISTENER is not None:
+        return
+
+    def run() -> None:
+        while True:
+            try:
+                with psycopg.connect(dsn, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    # anything may have changed while we were not listening
+                    invalidate_all()
+                    for note in conn.notifies():
+                        try:
+                            _apply(json.loads(note.payload))
+                        except ValueError:
+                            invalidate_all()
+            except Exception as exc:
+                print("cache listener error:", exc)
+                time.sleep(5)
+
+    _LISTENER = threading.Thread(target=run, name="pst-cache-listener", daemon=True)
+    _LISTENER.start()
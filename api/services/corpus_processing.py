@@ -1,13 +1,17 @@
 from __future__ import annotations
 
+import io
 import json
 import re
 from collections import defaultdict
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
+import numpy as np
 from lxml import etree
 
-from api.channelizers import run_channels
+from api.channelizers import channel_version, storage_dim
+from api.services import metrics
+from api.services.vector_cache import DDL as CHANNEL_VECTOR_DDL, cached_channels_batch_async
 
 
 PATH_SANITIZER = re.compile(r"[^A-Za-z0-9_]+")
@@ -30,6 +34,14 @@ def _collapse_tail_text(node: etree._Element) -> Optional[str]:
     return text or None
 
 
+def _as_bytes(xml_bytes: bytes | bytearray | memoryview | str) -> bytes:
+    if isinstance(xml_bytes, str):
+        return xml_bytes.encode("utf-8")
+    if isinstance(xml_bytes, memoryview):
+        return xml_bytes.tobytes()
+    return bytes(xml_bytes)
+
+
 def parse_xml_bytes(xml_bytes: bytes | bytearray | memoryview | str, domain: str, doc_key: str) -> List[Dict[str, Any]]:
     """
     Convert raw XML into a flat list of unit dicts ready for persistence.
@@ -37,14 +49,7 @@ def parse_xml_bytes(xml_bytes: bytes | bytearray | memoryview | str, domain: str
     Each unit carries the minimal metadata necessary to create doc_unit rows and
     later derive channel moves.
     """
-    if isinstance(xml_bytes, str):
-        xml_bytes = xml_bytes.encode("utf-8")
-    elif isinstance(xml_bytes, memoryview):
-        xml_bytes = xml_bytes.tobytes()
-    else:
-        xml_bytes = bytes(xml_bytes)
-
-    root = etree.fromstring(xml_bytes)
+    root = etree.fromstring(_as_bytes(xml_bytes))
     counters: Dict[Tuple[Optional[str], str], int] = defaultdict(int)
     units: List[Dict[str, Any]] = []
 
@@ -84,6 +89,73 @@ def parse_xml_bytes(xml_bytes: bytes | bytearray | memoryview | str, domain: str
     return units
 
 
+def iter_xml_units(
+    source: bytes | bytearray | memoryview | str | IO[bytes],
+    domain: str,
+    doc_key: str,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming counterpart of parse_xml_bytes built on lxml iterparse.
+
+    Units carry the same fields and paths as parse_xml_bytes but are yielded
+    as their elements close (children before parents). Each closed subtree is
+    cleared and its earlier siblings are dropped once their tails have been
+    folded into the parent's text, so peak memory tracks document depth
+    rather than document size.
+    """
+    if not hasattr(source, "read"):
+        source = io.BytesIO(_as_bytes(source))
+
+    # one frame per open element: [path, ordinal, tails, child counters]
+    stack: List[List[Any]] = []
+    for event, node in etree.iterparse(source, events=("start", "end")):
+        if event == "start":
+            parent_path = stack[-1][0] if stack else None
+            if stack:
+                frame = stack[-1]
+                parent = node.getparent()
+                while parent[0] is not node:
+                    first = parent[0]
+                    if first.tail and first.tail.strip():
+                        frame[2].append(first.tail.strip())
+                    del parent[0]
+                counters = frame[3]
+            else:
+                counters = defaultdict(int)
+            kind = _sanitize_token(etree.QName(node).localname.lower())
+            counters[kind] += 1
+            ordinal = counters[kind]
+            path = f"{parent_path}.{kind}.{ordinal:03d}" if parent_path else f"{kind}.{ordinal:03d}"
+            stack.append([path, ordinal, [], defaultdict(int)])
+            continue
+
+        path, ordinal, tails, _ = stack.pop()
+        parts = [node.text.strip()] if node.text and node.text.strip() else []
+        parts.extend(tails)
+        for child in node:
+            if child.tail and child.tail.strip():
+                parts.append(child.tail.strip())
+        text = " ".join(parts).strip() or None
+
+        tag = etree.QName(node).localname
+        label = node.get("label") or node.get("name") or node.get("title") or node.get("id")
+        meta = {k: v for k, v in node.attrib.items() if k not in {"label", "name", "title", "id"}}
+        meta["tag"] = tag
+
+        yield {
+            "domain": domain,
+            "doc_key": doc_key,
+            "kind": _sanitize_token(tag.lower()),
+            "label": label,
+            "path": path,
+            "ordinal": ordinal,
+            "text": text,
+            "meta": meta,
+            "parent_path": stack[-1][0] if stack else None,
+        }
+        node.clear(keep_tail=True)
+
+
 async def ensure_pst_tables(conn) -> None:
     """Create the core PST tables if they are missing."""
     await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
@@ -116,13 +188,15 @@ async def ensure_pst_tables(conn) -> None:
             session_id TEXT,
             domain     TEXT,
             channel    TEXT,
+            channel_version TEXT,
             span       JSONB,
-            features   VECTOR(384),
+            features   VECTOR,             -- 384-d, or the channel's true width (COMPACT_CHANNELS)
             created_at TIMESTAMPTZ DEFAULT now(),
             frame_id   INTEGER
         );
         """
     )
+    await conn.execute("ALTER TABLE move ADD COLUMN IF NOT EXISTS channel_version TEXT")
     await conn.execute("CREATE INDEX IF NOT EXISTS move_domain_channel_idx ON move (domain, channel)")
     await conn.execute("CREATE INDEX IF NOT EXISTS move_session_id_idx ON move (session_id)")
 
@@ -133,7 +207,7 @@ async def ensure_pst_tables(conn) -> None:
             source_move BIGINT REFERENCES move(id) ON DELETE CASCADE,
             target_move BIGINT REFERENCES move(id) ON DELETE CASCADE,
             channel     TEXT,
-            delta       VECTOR(384),
+            delta       VECTOR,
             weight      DOUBLE PRECISION DEFAULT 0.0,
             freq        INTEGER DEFAULT 0,
             last_seen   TIMESTAMPTZ DEFAULT now(),
@@ -143,29 +217,62 @@ async def ensure_pst_tables(conn) -> None:
     )
     await conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS move_edge_uniq ON move_edge (source_move, target_move, channel)")
     await conn.execute("CREATE INDEX IF NOT EXISTS move_edge_channel_idx ON move_edge (channel)")
+    await conn.execute(CHANNEL_VECTOR_DDL)
 
 
 async def upsert_doc_unit(conn, session_id: str, domain: str, units: Iterable[Dict[str, Any]]) -> int:
     """
     Replace doc_unit rows for the supplied units and return count inserted.
 
-    The units iterable is expected to come from parse_xml_bytes.
+    The units iterable is expected to come from parse_xml_bytes. Units are
+    copied into a session-local staging table in one COPY, upserted with a
+    single INSERT ... SELECT, and parent_id is then resolved for every unit at
+    once by joining on parent_path.
     """
     units = list(units)
     if not units:
         return 0
 
     doc_key = units[0]["doc_key"]
-    await conn.execute("DELETE FROM doc_unit WHERE domain=$1 AND doc_key=$2", domain, doc_key)
-
-    path_to_id: Dict[str, int] = {}
-    inserted = 0
-    for unit in units:
-        parent_id = path_to_id.get(unit.get("parent_path"))
-        row = await conn.fetchrow(
+    async with conn.transaction():
+        await conn.execute("DELETE FROM doc_unit WHERE domain=$1 AND doc_key=$2", domain, doc_key)
+        await conn.execute(
+            """
+            CREATE TEMP TABLE IF NOT EXISTS doc_unit_stage (
+                doc_key     TEXT,
+                kind        TEXT,
+                label       TEXT,
+                path        TEXT,
+                ordinal     INTEGER,
+                text        TEXT,
+                meta        TEXT,
+                parent_path TEXT
+            ) ON COMMIT DELETE ROWS
             """
-            INSERT INTO doc_unit (domain, doc_key, kind, label, path, ordinal, text, meta, parent_id)
-            VALUES ($1,$2,$3,$4,$5::ltree,$6,$7,$8::jsonb,$9)
+        )
+        await conn.execute("TRUNCATE doc_unit_stage")
+        await conn.copy_records_to_table(
+            "doc_unit_stage",
+            records=[
+                (
+                    unit["doc_key"],
+                    unit["kind"],
+                    unit.get("label"),
+                    unit["path"],
+                    unit.get("ordinal"),
+                    unit.get("text"),
+                    json.dumps(unit.get("meta") or {}),
+                    unit.get("parent_path"),
+                )
+                for unit in units
+            ],
+            columns=["doc_key", "kind", "label", "path", "ordinal", "text", "meta", "parent_path"],
+        )
+        status = await conn.execute(
+            """
+            INSERT INTO doc_unit (domain, doc_key, kind, label, path, ordinal, text, meta)
+            SELECT $1, doc_key, kind, label, path::ltree, ordinal, text, meta::jsonb
+            FROM doc_unit_stage
             ON CONFLICT (domain, doc_key, path)
             DO UPDATE SET
                 kind = EXCLUDED.kind,
@@ -173,83 +280,218 @@ async def upsert_doc_unit(conn, session_id: str, domain: str, units: Iterable[Di
                 ordinal = EXCLUDED.ordinal,
                 text = EXCLUDED.text,
                 meta = EXCLUDED.meta,
-                parent_id = EXCLUDED.parent_id
-            RETURNING id
+                parent_id = NULL
+            """,
+            domain,
+        )
+        await conn.execute(
+            """
+            UPDATE doc_unit c
+            SET parent_id = p.id
+            FROM doc_unit_stage s
+            JOIN doc_unit p
+              ON p.domain = $1
+             AND p.doc_key = s.doc_key
+             AND p.path = s.parent_path::ltree
+            WHERE s.parent_path IS NOT NULL
+              AND c.domain = $1
+              AND c.doc_key = s.doc_key
+              AND c.path = s.path::ltree
             """,
             domain,
-            unit["doc_key"],
-            unit["kind"],
-            unit.get("label"),
-            unit["path"],
-            unit.get("ordinal"),
-            unit.get("text"),
-            json.dumps(unit.get("meta") or {}),
-            parent_id,
         )
-        if row:
-            unit_id = row["id"]
-            path_to_id[unit["path"]] = unit_id
-            inserted += 1
 
-    return inserted
+    return int(status.split()[-1])
+
 
+def _text_units(units: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [u for u in units if (u.get("text") or "").strip()]
 
-async def write_moves(conn, session_id: str, domain: str, units: Iterable[Dict[str, Any]]) -> int:
+
+async def channelize_units(conn, units: Iterable[Dict[str, Any]], compute=None) -> Dict[str, np.ndarray]:
     """
-    Materialize channel moves from unit text and return number of moves inserted.
+    Channel matrices for the units with text, read through the channel_vector
+    cache; ``compute`` (see cached_channels_batch_async) handles the misses.
     """
-    prev_by_channel: Dict[str, Tuple[int, List[float]]] = {}
-    inserted = 0
+    texts = [u["text"].strip() for u in _text_units(units)]
+    with metrics.stage("channelize"):
+        return await cached_channels_batch_async(conn, texts, compute=compute)
+
+
+async def write_moves(
+    conn,
+    session_id: str,
+    domain: str,
+    units: Iterable[Dict[str, Any]],
+    chain: Optional[Dict[str, Tuple[int, np.ndarray]]] = None,
+    matrices: Optional[Dict[str, np.ndarray]] = None,
+    compute=None,
+) -> int:
+    """
+    Materialize channel moves from unit text and return number of moves inserted.
 
-    for unit in units:
-        text = (unit.get("text") or "").strip()
-        if not text:
-            continue
+    Move ids are reserved from the sequence up front so that moves and edges
+    can each be written with a single executemany; edge deltas come from the
+    channel matrices rather than a re-read of the move rows. Passing the same
+    chain dict across calls links the first move of each call to the last move
+    of the previous one, per channel. Precomputed matrices (see
+    channelize_units) must have one row per unit with non-empty text;
+    otherwise they are computed here, with ``compute`` as in channelize_units.
+    """
+    units = _text_units(units)
+    if not units:
+        return 0
+    if matrices is None:
+        matrices = await channelize_units(conn, units, compute=compute)
+    if not matrices:
+        return 0
 
-        span = {
-            "doc_key": unit["doc_key"],
-            "path": unit["path"],
-            "kind": unit["kind"],
-            "ordinal": unit.get("ordinal"),
-        }
+    n = len(units)
+    id_rows = await conn.fetch(
+        "SELECT nextval(pg_get_serial_sequence('move', 'id')) AS id FROM generate_series(1, $1)",
+        n * len(matrices),
+    )
+    ids = sorted(r["id"] for r in id_rows)
 
-        channel_vectors = run_channels(text)
-        for channel, vec in channel_vectors.items():
-            row = await conn.fetchrow(
+    spans = [
+        json.dumps(
+            {
+                "doc_key": unit["doc_key"],
+                "path": unit["path"],
+                "kind": unit["kind"],
+                "ordinal": unit.get("ordinal"),
+            }
+        )
+        for unit in units
+    ]
+    context = json.dumps({"session_id": session_id, "domain": domain})
+
+    move_records: List[Tuple[Any, ...]] = []
+    edge_records: List[Tuple[Any, ...]] = []
+    for j, (channel, full) in enumerate(matrices.items()):
+        move_ids = ids[j * n:(j + 1) * n]
+        matrix = full[:, :storage_dim(channel)]
+        version = channel_version(channel)
+        deltas = np.diff(matrix, axis=0)
+        prev = chain.get(channel) if chain is not None else None
+        if prev:
+            prev_id, prev_vec = prev
+            edge_records.append((prev_id, move_ids[0], channel, (matrix[0] - prev_vec).tolist(), context))
+        for row_idx in range(n):
+            move_records.append((move_ids[row_idx], session_id, domain, channel, version, spans[row_idx], matrix[row_idx].tolist()))
+            if row_idx:
+                edge_records.append((move_ids[row_idx - 1], move_ids[row_idx], channel, deltas[row_idx - 1].tolist(), context))
+        if chain is not None:
+            chain[channel] = (move_ids[-1], matrix[-1].copy())
+
+    with metrics.query("move_insert"):
+        await conn.executemany(
+            """
+            INSERT INTO move (id, session_id, domain, channel, channel_version, span, features)
+            VALUES ($1,$2,$3,$4,$5,$6::jsonb,$7::float8[]::vector)
+            """,
+            move_records,
+        )
+    if edge_records:
+        with metrics.query("move_edge_insert"):
+            await conn.executemany(
                 """
-                INSERT INTO move (session_id, domain, channel, span, features)
-                VALUES ($1,$2,$3,$4::jsonb,$5::float8[]::vector(384))
-                RETURNING id
+                INSERT INTO move_edge (source_move, target_move, channel, delta, weight, freq, last_seen, context)
+                VALUES ($1,$2,$3,$4::float8[]::vector,0.0,1,now(),$5::jsonb)
+                ON CONFLICT (source_move, target_move, channel) DO NOTHING
                 """,
-                session_id,
-                domain,
-                channel,
-                json.dumps(span),
-                vec,
+                edge_records,
             )
-            if not row:
-                continue
-
-            move_id = row["id"]
-            prev_entry = prev_by_channel.get(channel)
-            if prev_entry:
-                prev_id, prev_vec = prev_entry
-                delta = [curr - prev for curr, prev in zip(vec, prev_vec)]
-                await conn.execute(
-                    """
-                    INSERT INTO move_edge (source_move, target_move, channel, delta, weight, freq, last_seen, context)
-                    VALUES ($1,$2,$3,$4::float8[]::vector(384),0.0,1,now(),$5::jsonb)
-                    ON CONFLICT (source_move, target_move, channel) DO NOTHING
-                    """,
-                    prev_id,
-                    move_id,
-                    channel,
-                    delta,
-                    json.dumps({"session_id": session_id, "domain": domain}),
-                )
 
-            prev_by_channel[channel] = (move_id, list(vec))
-            inserted += 1
+    return len(move_records)
 
-    return inserted
 
+async def resolve_doc_unit_parents(conn, domain: str, doc_key: str) -> str:
+    """
+    Set parent_id for every unit of a document in one statement.
+
+    Relies on the parse_xml_bytes path scheme, where a unit's path is its
+    parent's path plus ``kind.NNN``.
+    """
+    return await conn.execute(
+        """
+        UPDATE doc_unit c
+        SET parent_id = p.id
+        FROM doc_unit p
+        WHERE c.domain = $1 AND c.doc_key = $2
+          AND p.domain = $1 AND p.doc_key = $2
+          AND nlevel(c.path) > 2
+          AND p.path = subpath(c.path, 0, nlevel(c.path) - 2)
+          AND c.parent_id IS DISTINCT FROM p.id
+        """,
+        domain,
+        doc_key,
+    )
+
+
+async def stream_corpus_document(
+    conn,
+    session_id: str,
+    domain: str,
+    doc_key: str,
+    source: bytes | bytearray | memoryview | str | IO[bytes],
+    *,
+    batch_size: int = 500,
+    compute=None,
+) -> int:
+    """
+    Stream one XML document into doc_unit and move rows in bounded batches.
+
+    Units come from iter_xml_units and are flushed every batch_size units, so
+    neither the element tree nor the full unit list is ever held. Parents
+    close after their children, so parent_id is filled in afterwards by
+    resolve_doc_unit_parents. Moves follow element close order. Returns the
+    number of units written. ``compute`` is passed on to channelize_units.
+    """
+    await conn.execute("DELETE FROM doc_unit WHERE domain=$1 AND doc_key=$2", domain, doc_key)
+
+    chain: Dict[str, Tuple[int, np.ndarray]] = {}
+    batch: List[Dict[str, Any]] = []
+    total = 0
+
+    async def flush() -> None:
+        nonlocal total
+        await conn.executemany(
+            """
+            INSERT INTO doc_unit (domain, doc_key, kind, label, path, ordinal, text, meta)
+            VALUES ($1,$2,$3,$4,$5::ltree,$6,$7,$8::jsonb)
+            ON CONFLICT (domain, doc_key, path)
+            DO UPDATE SET
+                kind = EXCLUDED.kind,
+                label = EXCLUDED.label,
+                ordinal = EXCLUDED.ordinal,
+                text = EXCLUDED.text,
+                meta = EXCLUDED.meta
+            """,
+            [
+                (
+                    domain,
+                    u["doc_key"],
+                    u["kind"],
+                    u.get("label"),
+                    u["path"],
+                    u.get("ordinal"),
+                    u.get("text"),
+                    json.dumps(u.get("meta") or {}),
+                )
+                for u in batch
+            ],
+        )
+        await write_moves(conn, session_id, domain, batch, chain=chain, compute=compute)
+        total += len(batch)
+        batch.clear()
+
+    for unit in iter_xml_units(source, domain, doc_key):
+        batch.append(unit)
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+
+    await resolve_doc_unit_parents(conn, domain, doc_key)
+    return total
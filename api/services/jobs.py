@@ -0,0 +1,215 @@
+"""Postgres-backed job queue for long-running ingest and explode work.
+
+Endpoints enqueue a row in ``job`` and return its id; ``worker/worker.py``
+claims queued rows with ``FOR UPDATE SKIP LOCKED`` and runs them through
+``run_job``. Handlers report progress with ``report_progress``, which is a
+no-op outside a job and raises ``JobCancelled`` once cancellation has been
+requested.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import json
+import time
+from typing import Any, Callable, Dict, Optional
+
+import psycopg
+from psycopg.rows import dict_row
+from psycopg.types.json import Json
+
+
+JOB_KINDS = ("ingest_unit", "xml_explode", "jsonl_explode", "process_corpus")
+PROGRESS_INTERVAL = 1.0   # seconds between progress writes
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once its cancellation has been requested."""
+
+
+class _JobContext:
+    def __init__(self, job_id: int, dsn: str):
+        self.job_id = job_id
+        # progress goes through its own autocommit connection so it stays
+        # visible while the handler's transaction is still open
+        self.conn = psycopg.connect(dsn, autocommit=True)
+        self.last_write = 0.0
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+_CURRENT: contextvars.ContextVar[Optional[_JobContext]] = contextvars.ContextVar("pst_job", default=None)
+
+
+def ensure_job_table(conn) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS job (
+            id               BIGSERIAL PRIMARY KEY,
+            kind             TEXT NOT NULL,
+            params           JSONB NOT NULL DEFAULT '{}'::jsonb,
+            state            TEXT NOT NULL DEFAULT 'queued',
+            progress         JSONB DEFAULT '{}'::jsonb,
+            result           JSONB,
+            error            TEXT,
+            cancel_requested BOOLEAN NOT NULL DEFAULT false,
+            worker           TEXT,
+            created_at       TIMESTAMPTZ DEFAULT now(),
+            started_at       TIMESTAMPTZ,
+            finished_at      TIMESTAMPTZ
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS job_queued_idx ON job (id) WHERE state = 'queued'")
+
+
+def enqueue_job(conn, kind: str, params: Dict[str, Any]) -> int:
+    """Queue a job on a psycopg connection and return its id."""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"unknown job kind {kind}")
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute("INSERT INTO job (kind, params) VALUES (%s, %s) RETURNING id", (kind, Json(params)))
+        return cur.fetchone()["id"]
+
+
+async def enqueue_job_async(conn, kind: str, params: Dict[str, Any]) -> int:
+    """asyncpg counterpart of enqueue_job."""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"unknown job kind {kind}")
+    return await conn.fetchval(
+        "INSERT INTO job (kind, params) VALUES ($1, $2::jsonb) RETURNING id", kind, json.dumps(params)
+    )
+
+
+def get_job(conn, job_id: int) -> Optional[Dict[str, Any]]:
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(
+            """
+            SELECT id, kind, state, progress, result, error, cancel_requested,
+                   worker, created_at, started_at, finished_at
+            FROM job WHERE id = %s
+            """,
+            (job_id,),
+        )
+        return cur.fetchone()
+
+
+def cancel_job(conn, job_id: int) -> Optional[str]:
+    """
+    Cancel a queued job outright or flag a running one; returns the new state.
+    """
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(
+            """
+            UPDATE job
+            SET cancel_requested = true,
+                state = CASE WHEN state = 'queued' THEN 'cancelled' ELSE state END,
+                finished_at = CASE WHEN state = 'queued' THEN now() ELSE finished_at END
+            WHERE id = %s
+            RETURNING state
+            """,
+            (job_id,),
+        )
+        row = cur.fetchone()
+        return row["state"] if row else None
+
+
+def claim_next(conn, worker: str) -> Optional[Dict[str, Any]]:
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(
+            """
+            UPDATE job
+            SET state = 'running', started_at = now(), worker = %s
+            WHERE id = (
+                SELECT id FROM job
+                WHERE state = 'queued'
+                ORDER BY id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING id, kind, params
+            """,
+            (worker,),
+        )
+        row = cur.fetchone()
+    conn.commit()
+    return row
+
+
+def report_progress(done: int, total: Optional[int] = None, stage: Optional[str] = None, *, force: bool = False) -> None:
+    """Record progress for the current job, if any, and honour cancellation."""
+    ctx = _CURRENT.get()
+    if ctx is None:
+        return
+    now = time.monotonic()
+    if not force and now - ctx.last_write < PROGRESS_INTERVAL:
+        return
+    ctx.last_write = now
+    progress = {"done": done, "total": total, "stage": stage}
+    row = ctx.conn.execute(
+        "UPDATE job SET progress = %s WHERE id = %s RETURNING cancel_requested",
+        (Json(progress), ctx.job_id),
+    ).fetchone()
+    if row and row[0]:
+        raise JobCancelled(f"job {ctx.job_id} cancelled")
+
+
+def _finish(conn, job_id: int, state: str, result: Any = None, error: Optional[str] = None) -> None:
+    conn.execute(
+        "UPDATE job SET state = %s, result = %s, error = %s, finished_at = now() WHERE id = %s",
+        (state, Json(result) if result is not None else None, error, job_id),
+    )
+    conn.commit()
+
+
+def _handler(kind: str) -> Callable[[Dict[str, Any]], Any]:
+    # imported lazily: api.app imports this module to enqueue jobs
+    from api import app as api_app
+    from api.routes.xml_process_corpus import process_corpus
+
+    return {
+        "ingest_unit": api_app.ingest_unit,
+        "xml_explode": api_app.xml_explode,
+        "jsonl_explode": api_app.jsonl_explode,
+        "process_corpus": lambda params: process_corpus(**params, background=False),
+    }[kind]
+
+
+def run_job(conn, job: Dict[str, Any], dsn: str, loop: Optional[asyncio.AbstractEventLoop] = None) -> str:
+    """
+    Run a claimed job to completion and record its outcome on conn.
+
+    Coroutine handlers are submitted to ``loop`` (a long-lived event loop the
+    caller runs in another thread) so the shared asyncpg pool stays bound to
+    one loop. Returns the final state.
+    """
+    ctx = _JobContext(job["id"], dsn)
+    token = _CURRENT.set(ctx)
+    try:
+        out = _handler(job["kind"])(dict(job["params"] or {}))
+        if asyncio.iscoroutine(out):
+            if loop is None:
+                out = asyncio.run(out)
+            else:
+                run_ctx = contextvars.copy_context()
+                out = asyncio.run_coroutine_threadsafe(_in_context(run_ctx, out), loop).result()
+        _finish(conn, job["id"], "done", result=out)
+        return "done"
+    except JobCancelled as exc:
+        _finish(conn, job["id"], "cancelled", error=str(exc))
+        return "cancelled"
+    except Exception as exc:
+        _finish(conn, job["id"], "failed", error=f"{type(exc).__name__}: {exc}")
+        return "failed"
+    finally:
+        _CURRENT.reset(token)
+        ctx.close()
+
+
+async def _in_context(run_ctx: contextvars.Context, coro):
+    # carry the job context var into the loop thread
+    for var, value in run_ctx.items():
+        var.set(value)
+    return await coro
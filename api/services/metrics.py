@@ -0,0 +1,208 @@
+"""In-process metrics served as Prometheus text on ``/metrics``.
+
+``MetricsMiddleware`` times every request per route template (including the
+streamed body of NDJSON responses). ``query(name)`` and ``stage(name)`` are
+context managers for database statements and handler stages, and the
+channelizers report per-channel time through ``CHANNEL_SECONDS``. Pool
+saturation is read from ``api.db.pool_stats`` at scrape time.
+
+Metrics live in the process that records them: with several uvicorn workers
+each one is scraped separately, and channelization done in a process pool
+(``/xml/process_corpus``) is not seen here.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(x: float) -> str:
+    return repr(float(x)) if x != int(x) else str(int(x))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labelnames, lv)} {_num(v)}" for lv, v in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labelvalues)
+            if s is None:
+                s = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    @contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *labelvalues)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((lv, (list(s[0]), s[1], s[2])) for lv, s in self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for lv, (counts, total, n) in series:
+            cumulative = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le_label = 'le="+Inf"' if le == float("inf") else f'le="{le!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, lv, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, lv)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, lv)} {n}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram("pst_http_request_duration_seconds", "Request latency per route.", ("method", "route"))
+REQUESTS = Counter("pst_http_requests_total", "Requests per route and status.", ("method", "route", "status"))
+QUERY_SECONDS = Histogram("pst_db_query_duration_seconds", "Database time per named query.", ("query",))
+STAGE_SECONDS = Histogram("pst_stage_duration_seconds", "Time per named handler stage.", ("stage",))
+CHANNEL_SECONDS = Histogram("pst_channel_duration_seconds", "Channelizer time per channel and call.", ("channel",))
+CHANNEL_TEXTS = Counter("pst_channel_texts_total", "Texts channelized per channel.", ("channel",))
+
+REGISTRY = [REQUEST_SECONDS, REQUESTS, QUERY_SECONDS, STAGE_SECONDS, CHANNEL_SECONDS, CHANNEL_TEXTS]
+
+
+def query(name: str):
+    """``with query("trajectory_upsert"): cur.execute(...)``"""
+    return QUERY_SECONDS.time(name)
+
+
+def stage(name: str):
+    return STAGE_SECONDS.time(name)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency per route template. The clock stops at
+    the last body chunk, so streamed responses are timed in full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = {"code": 500}
+        done = False
+
+        def record():
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, scope["method"], path)
+            REQUESTS.inc(1, scope["method"], path, str(status["code"]))
+
+        async def send_wrapper(message):
+            nonlocal done
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and not done:
+                done = True
+                record()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not done:   # exception or client gone before the body finished
+                done = True
+                record()
+
+
+# psycopg_pool / asyncpg stats keys exported as gauges
+_POOL_GAUGES = {
+    "pool_size": ("pst_pool_connections", "Connections currently open."),
+    "pool_available": ("pst_pool_idle_connections", "Idle connections."),
+    "max_size": ("pst_pool_max_connections", "Configured maximum connections."),
+    "requests_waiting": ("pst_pool_waiting", "Callers waiting for a connection."),
+}
+_POOL_COUNTERS = {
+    "requests_num": ("pst_pool_requests_total", "Connection requests served."),
+    "requests_wait_ms": ("pst_pool_wait_seconds_total", "Time callers spent waiting for a connection."),
+    "requests_errors": ("pst_pool_request_errors_total", "Connection requests that failed or timed out."),
+}
+
+
+def _render_pools(pool_stats: Dict[str, Optional[Dict[str, Any]]]) -> List[str]:
+    pools = [(name, s) for name, s in sorted(pool_stats.items()) if s]
+    lines = []
+    for key, (metric, help) in _POOL_GAUGES.items():
+        rows = [(name, s[key]) for name, s in pools if key in s]
+        if rows:
+            lines += [f"# HELP {metric} {help}", f"# TYPE {metric} gauge"]
+            lines += [f'{metric}{{pool="{name}"}} {_num(v)}' for name, v in rows]
+    rows = [(name, s) for name, s in pools if "pool_size" in s and "pool_available" in s and s.get("max_size")]
+    if rows:
+        lines += ["# HELP pst_pool_saturation Share of max_size connections checked out.",
+                  "# TYPE pst_pool_saturation gauge"]
+        lines += [f'pst_pool_saturation{{pool="{name}"}} {_num((s["pool_size"] - s["pool_available"]) / s["max_size"])}'
+                  for name, s in rows]
+    for key, (metric, help) in _POOL_COUNTERS.items():
+        rows = [(name, s[key]) for name, s in pools if key in s]
+        if rows:
+            scale = 1000.0 if key.endswith("_ms") else 1.0
+            lines += [f"# HELP {metric} {help}", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{pool="{name}"}} {_num(v / scale)}' for name, v in rows]
+    return lines
+
+
+def render(pool_stats: Optional[Dict[str, Optional[Dict[str, Any]]]] = None) -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    if pool_stats:
+        lines += _render_pools(pool_stats)
+    return "\n".join(lines) + "\n"
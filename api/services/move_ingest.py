@@ -4,14 +4,19 @@ import json
 import re
 import time
 import uuid
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence, Union
 
+import numpy as np
+from psycopg.rows import dict_row
 from psycopg.types.json import Json
 
-from api.channelizers import run_channels
+from api.channelizers import EMB_DIM, channel_version, storage_dim
+from api.services import metrics
+from api.services.vector_cache import cached_channels_batch
 
 
 SENT_SPLIT = re.compile(r"(?<=[.!?])\s+")
+MAX_SENTENCE_CHARS = 10_000   # SentenceBuffer force-splits unpunctuated runs longer than this
 
 
 def sentence_split(text: str) -> List[str]:
@@ -24,11 +29,200 @@ def sentence_split(text: str) -> List[str]:
     return [segment.strip() for segment in SENT_SPLIT.split(text) if segment.strip()]
 
 
+class SentenceBuffer:
+    """
+    Incremental sentence_split for text that arrives in arbitrary chunks.
+
+    feed() returns the sentences completed so far; the trailing fragment is
+    held back until more text (or flush()) shows where it ends. Feeding a
+    text in pieces yields the same sentences as sentence_split on the whole,
+    except that a fragment longer than max_chars without a sentence break is
+    cut at its last whitespace (or hard at max_chars), so the held-back text
+    stays bounded. Each feed() only scans the new chunk plus the last
+    character held back.
+    """
+
+    def __init__(self, max_chars: int = MAX_SENTENCE_CHARS) -> None:
+        self.carry = ""
+        self.max_chars = max_chars
+
+    def feed(self, chunk: str) -> List[str]:
+        if not chunk:
+            return []
+        # the held-back fragment has no break in it; one may only end in the
+        # new text, with its punctuation at most one character earlier
+        start = max(len(self.carry) - 1, 0)
+        self.carry += chunk
+        out: List[str] = []
+        prev = 0
+        for m in SENT_SPLIT.finditer(self.carry, start):
+            segment = self.carry[prev:m.start()].strip()
+            if segment:
+                out.append(segment)
+            prev = m.end()
+        self.carry = self.carry[prev:]
+        while len(self.carry) > self.max_chars:
+            cut = self.carry.rfind(" ", 0, self.max_chars) + 1 or self.max_chars
+            segment, self.carry = self.carry[:cut].strip(), self.carry[cut:]
+            if segment:
+                out.append(segment)
+        return out
+
+    def flush(self) -> List[str]:
+        tail, self.carry = self.carry.strip(), ""
+        return [tail] if tail else []
+
+
 def default_session_id(domain: str) -> str:
     """Build a stable session identifier for ingest endpoints."""
     return f"{domain}_{int(time.time()*1000)}_{uuid.uuid4().hex[:6]}"
 
 
+def _per_text(value: Union[str, Sequence[str]], n: int) -> List[str]:
+    return [value] * n if isinstance(value, str) else list(value)
+
+
+def _vector_literal(row: np.ndarray) -> str:
+    return "[" + ",".join(map(str, row.tolist())) + "]"
+
+
+def _reserve_move_ids(cur, n: int) -> List[int]:
+    """Pull n ids from the move sequence in one round-trip."""
+    cur.execute(
+        "SELECT nextval(pg_get_serial_sequence('move', 'id')) AS id FROM generate_series(1, %s)",
+        (n,),
+    )
+    return sorted(r["id"] for r in cur.fetchall())
+
+
+def _load_move_vectors(cur, move_ids: Sequence[int]) -> Dict[int, np.ndarray]:
+    """Read move features back as full-width rows (compact rows are zero-padded)."""
+    cur.execute("SELECT id, features::text AS features FROM move WHERE id = ANY(%s)", (list(move_ids),))
+    out = {}
+    for r in cur.fetchall():
+        vec = np.zeros(EMB_DIM, dtype=np.float32)
+        vals = json.loads(r["features"])[:EMB_DIM]
+        vec[:len(vals)] = vals
+        out[r["id"]] = vec
+    return out
+
+
+def ingest_texts(
+    conn,
+    texts: Sequence[str],
+    *,
+    session_id: Union[str, Sequence[str]],
+    domain: Union[str, Sequence[str]],
+    used_channels: Optional[List[str]] = None,
+    spans: Optional[Sequence[dict]] = None,
+    prev_by_channel: Optional[Dict[str, int]] = None,
+    prev_vec_by_channel: Optional[Dict[str, np.ndarray]] = None,
+) -> Dict[str, any]:
+    """
+    Bulk variant of ingest_one_text for a whole document.
+
+    Move ids are reserved from the sequence up front, moves are streamed with
+    COPY, and edge deltas are computed client-side from the channel matrices
+    before a second COPY writes every move_edge row. session_id and domain may
+    be a single value or one value per text. Empty texts are skipped without
+    breaking the per-channel chain.
+    """
+    n_all = len(texts)
+    sessions = _per_text(session_id, n_all)
+    domains = _per_text(domain, n_all)
+    spans = list(spans) if spans is not None else [{} for _ in range(n_all)]
+
+    keep = [i for i, t in enumerate(texts) if t and t.strip()]
+    prev_by_channel = dict(prev_by_channel or {})
+    prev_vec_by_channel = dict(prev_vec_by_channel or {})
+    summary = {
+        "move_ids_by_channel": {},
+        "prev_by_channel": prev_by_channel,
+        "prev_vec_by_channel": prev_vec_by_channel,
+        "moves": 0,
+        "edges": 0,
+    }
+    if not keep:
+        return summary
+
+    with metrics.stage("channelize"):
+        matrices = cached_channels_batch(conn, [texts[i] for i in keep], used_channels)
+    if not matrices:
+        return summary
+    n = len(keep)
+
+    with conn.cursor(row_factory=dict_row) as cur:
+        missing = [prev_by_channel[ch] for ch in matrices if prev_by_channel.get(ch) and ch not in prev_vec_by_channel]
+        if missing:
+            with metrics.query("move_vectors_load"):
+                loaded = _load_move_vectors(cur, missing)
+            for ch in matrices:
+                prev_id = prev_by_channel.get(ch)
+                if prev_id in loaded:
+                    prev_vec_by_channel[ch] = loaded[prev_id]
+
+        with metrics.query("move_id_reserve"):
+            ids = _reserve_move_ids(cur, n * len(matrices))
+        ids_by_channel = {ch: ids[j * n:(j + 1) * n] for j, ch in enumerate(matrices)}
+
+        # rows are built first so the query timers cover only the COPYs
+        with metrics.stage("move_rows"):
+            move_rows = []
+            edge_rows = []
+            for ch, matrix in matrices.items():
+                move_ids = ids_by_channel[ch]
+                dim = storage_dim(ch)
+                version = channel_version(ch)
+                for row_idx, src in enumerate(keep):
+                    move_rows.append((
+                        move_ids[row_idx],
+                        sessions[src],
+                        domains[src],
+                        ch,
+                        version,
+                        Json(spans[src] or {}),
+                        _vector_literal(matrix[row_idx, :dim]),
+                    ))
+
+                deltas = np.diff(matrix[:, :dim], axis=0)
+                prev_id = prev_by_channel.get(ch)
+                prev_vec = prev_vec_by_channel.get(ch)
+                if prev_id and prev_vec is not None:
+                    src = keep[0]
+                    edge_rows.append((
+                        prev_id, move_ids[0], ch, _vector_literal((matrix[0] - prev_vec)[:dim]), 0.0, 1,
+                        Json({"domain": domains[src], "session_id": sessions[src]}),
+                    ))
+                for row_idx in range(1, n):
+                    src = keep[row_idx]
+                    edge_rows.append((
+                        move_ids[row_idx - 1], move_ids[row_idx], ch, _vector_literal(deltas[row_idx - 1]), 0.0, 1,
+                        Json({"domain": domains[src], "session_id": sessions[src]}),
+                    ))
+
+                prev_by_channel[ch] = move_ids[-1]
+                prev_vec_by_channel[ch] = matrix[-1].copy()
+
+        with metrics.query("move_insert"), cur.copy(
+            "COPY move (id, session_id, domain, channel, channel_version, span, features) FROM STDIN"
+        ) as copy:
+            for row in move_rows:
+                copy.write_row(row)
+
+        with metrics.query("move_edge_insert"), cur.copy(
+            "COPY move_edge (source_move, target_move, channel, delta, weight, freq, context) FROM STDIN"
+        ) as copy:
+            for row in edge_rows:
+                copy.write_row(row)
+
+    summary.update(
+        move_ids_by_channel=ids_by_channel,
+        moves=len(move_rows),
+        edges=len(edge_rows),
+    )
+    return summary
+
+
 def ingest_one_text(
     conn,
     text: str,
@@ -43,64 +237,20 @@ def ingest_one_text(
     Run channels over a single text snippet, insert move rows, and link edges.
 
     Returns a small summary that callers can use to accumulate results across
-    a batch ingest.
+    a batch ingest. Prefer ingest_texts when a whole document is available.
     """
-    if not text or not text.strip():
-        return {
-            "move_for_channel": {},
-            "prev_by_channel": prev_by_channel or {},
-            "moves": 0,
-            "edges": 0,
-        }
-
-    channel_vectors = run_channels(text, used_channels)
-    move_for_channel: Dict[str, int] = {}
-    edges_made = 0
-    span = span or {}
-    prev_by_channel = dict(prev_by_channel or {})
-
-    with conn.cursor() as cur:
-        for channel, vec in channel_vectors.items():
-            cur.execute(
-                """
-                INSERT INTO move (session_id, domain, channel, span, features)
-                VALUES (%s,%s,%s,%s, (%s)::float8[]::vector(384))
-                RETURNING id
-                """,
-                (session_id, domain, channel, Json(span), vec),
-            )
-            move_id = cur.fetchone()["id"]
-            move_for_channel[channel] = move_id
-
-            prev_move = prev_by_channel.get(channel)
-            if prev_move:
-                cur.execute(
-                    """
-                    INSERT INTO move_edge (source_move, target_move, channel, delta, weight, freq, last_seen, context)
-                    SELECT %s, %s, %s,
-                           (m2.features - m1.features),
-                           0.0, 1, now(), %s
-                    FROM (SELECT features FROM move WHERE id=%s) m1,
-                         (SELECT features FROM move WHERE id=%s) m2
-                    ON CONFLICT DO NOTHING
-                    """,
-                    (
-                        prev_move,
-                        move_id,
-                        channel,
-                        Json({"domain": domain, "session_id": session_id}),
-                        prev_move,
-                        move_id,
-                    ),
-                )
-                edges_made += 1
-
-            prev_by_channel[channel] = move_id
-
+    out = ingest_texts(
+        conn,
+        [text],
+        session_id=session_id,
+        domain=domain,
+        used_channels=used_channels,
+        spans=[span or {}],
+        prev_by_channel=prev_by_channel,
+    )
     return {
-        "move_for_channel": move_for_channel,
-        "prev_by_channel": prev_by_channel,
-        "moves": len(move_for_channel),
-        "edges": edges_made,
+        "move_for_channel": {ch: ids[0] for ch, ids in out["move_ids_by_channel"].items()},
+        "prev_by_channel": out["prev_by_channel"],
+        "moves": out["moves"],
+        "edges": out["edges"],
     }
-
@@ -0,0 +1,204 @@
+"""Next-concept prediction beyond observed trajectories.
+
+``observed_next`` is the baseline ranking of trajectory rows by weight.
+``vector_next`` extrapolates the move: the source embedding is shifted by a
+typical delta (the mean of the source's strongest observed deltas, or of its
+nearest neighbours' when the source has none) and the concepts closest to
+that point are found through the ivfflat index on ``concept.embedding``.
+``blend_predictions`` merges both into one score. ``beam_paths`` rolls
+trajectories out several hops for ``/predict/path``.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Optional
+
+import psycopg
+from psycopg.rows import dict_row
+
+
+DELTA_SAMPLE = 16       # strongest observed deltas averaged into the typical move
+NEIGHBOURS = 8          # analogue sources borrowed for concepts with no trajectories
+
+
+def observed_next(cur, source_id: int, k: int) -> List[Dict[str, Any]]:
+    cur.execute(
+        """
+        SELECT t.target_id, t.weight, t.freq, c.key AS target_key
+        FROM trajectory t JOIN concept c ON c.id = t.target_id
+        WHERE t.source_id = %s
+        ORDER BY t.weight DESC, t.freq DESC
+        LIMIT %s
+        """,
+        (source_id, k),
+    )
+    return list(cur.fetchall())
+
+
+def _set_local(cur, name: str, value: str) -> None:
+    cur.execute("SELECT set_config(%s, %s, true)", (name, value))
+
+
+def vector_next(
+    conn,
+    source_id: int,
+    k: int,
+    *,
+    probes: int = 10,
+    budget_ms: float = 50.0,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    k nearest concepts to embedding(source) + typical delta, with similarity
+    1/(1+L2 distance). Runs under a statement_timeout of ``budget_ms``;
+    returns None when the budget is exhausted.
+    """
+    t0 = time.monotonic()
+    try:
+        with conn.transaction(), conn.cursor(row_factory=dict_row) as cur:
+            _set_local(cur, "ivfflat.probes", str(max(1, probes)))
+            _set_local(cur, "statement_timeout", f"{max(1, int(budget_ms))}ms")
+            cur.execute(
+                """
+                SELECT embedding::text AS e,
+                       (SELECT avg(delta)::text FROM (
+                          SELECT delta FROM trajectory
+                          WHERE source_id = %(s)s AND delta IS NOT NULL
+                          ORDER BY weight DESC LIMIT %(m)s) own) AS d
+                FROM concept WHERE id = %(s)s AND embedding IS NOT NULL
+                """,
+                {"s": source_id, "m": DELTA_SAMPLE},
+            )
+            row = cur.fetchone()
+            if row is None:
+                return []
+            emb, delta = row["e"], row["d"]
+            if delta is None:
+                cur.execute(
+                    """
+                    SELECT avg(t.delta)::text AS d
+                    FROM trajectory t
+                    WHERE t.delta IS NOT NULL AND t.source_id IN (
+                      SELECT id FROM concept
+                      WHERE id <> %(s)s AND embedding IS NOT NULL
+                      ORDER BY embedding <-> %(e)s::vector
+                      LIMIT %(n)s)
+                    """,
+                    {"s": source_id, "e": emb, "n": NEIGHBOURS},
+                )
+                delta = cur.fetchone()["d"]
+
+            remaining = budget_ms - (time.monotonic() - t0) * 1000.0
+            if remaining <= 0:
+                return None
+            _set_local(cur, "statement_timeout", f"{max(1, int(remaining))}ms")
+            # with no deltas anywhere nearby this degrades to plain k-NN
+            cur.execute(
+                """
+                SELECT c.id AS target_id, c.key AS target_key,
+                       1.0 / (1.0 + (c.embedding <-> q.p)) AS similarity
+                FROM (SELECT CASE WHEN %(d)s::text IS NULL THEN %(e)s::vector
+                                  ELSE %(e)s::vector + %(d)s::vector END AS p) q,
+                     LATERAL (
+                       SELECT id, key, embedding FROM concept
+                       WHERE id <> %(s)s AND embedding IS NOT NULL
+                       ORDER BY embedding <-> q.p
+                       LIMIT %(k)s) c
+                ORDER BY similarity DESC
+                """,
+                {"s": source_id, "e": emb, "d": delta, "k": k},
+            )
+            return list(cur.fetchall())
+    except psycopg.errors.QueryCanceled:
+        return None
+
+
+def blend_predictions(
+    observed: List[Dict[str, Any]],
+    extrapolated: List[Dict[str, Any]],
+    k: int,
+    alpha: float,
+) -> List[Dict[str, Any]]:
+    """score = alpha * observed weight + (1 - alpha) * similarity."""
+    merged: Dict[int, Dict[str, Any]] = {}
+    for r in observed:
+        merged[r["target_id"]] = {**r, "similarity": 0.0}
+    for r in extrapolated:
+        m = merged.setdefault(r["target_id"], {"target_id": r["target_id"], "target_key": r["target_key"],
+                                                 "weight": 0.0, "freq": 0, "similarity": 0.0})
+        m["similarity"] = float(r["similarity"])
+    for m in merged.values():
+        m["score"] = alpha * float(m["weight"] or 0.0) + (1.0 - alpha) * m["similarity"]
+    return sorted(merged.values(), key=lambda m: m["score"], reverse=True)[:k]
+
+
+def _out_edges(cur, sources: List[int], fanout: int) -> Dict[int, List[tuple]]:
+    """Top-``fanout`` transitions for every source in one query; p is weight over the source's total."""
+    cur.execute(
+        """
+        SELECT source_id, target_id, key, weight, freq, weight / NULLIF(total, 0) AS p
+        FROM (
+          SELECT t.source_id, t.target_id, c.key, t.weight, t.freq,
+                 sum(t.weight) OVER (PARTITION BY t.source_id) AS total,
+                 row_number() OVER (PARTITION BY t.source_id ORDER BY t.weight DESC, t.freq DESC) AS rn
+          FROM trajectory t JOIN concept c ON c.id = t.target_id
+          WHERE t.source_id = ANY(%s) AND t.weight > 0
+        ) x
+        WHERE rn <= %s
+        """,
+        (sources, fanout),
+    )
+    adj: Dict[int, List[tuple]] = {s: [] for s in sources}
+    for r in cur.fetchall():
+        adj[r["source_id"]].append((r["target_id"], r["key"], float(r["p"] or 0.0)))
+    return adj
+
+
+def beam_paths(
+    cur,
+    source_id: int,
+    source_key: str,
+    *,
+    depth: int = 3,
+    beam: int = 5,
+    k: int = 5,
+    budget_ms: float = 200.0,
+) -> Dict[str, Any]:
+    """
+    Beam search over trajectory for the k most probable paths of up to
+    ``depth`` hops. Adjacency is fetched one level at a time for the whole
+    frontier and memoised, so the query count is bounded by depth. Paths do
+    not revisit a concept; a path whose tail has no successors is kept as
+    finished. If the time budget runs out the best paths so far are returned
+    with ``truncated`` set.
+    """
+    t0 = time.monotonic()
+    adj: Dict[int, List[tuple]] = {}
+    # (probability, ids, keys)
+    frontier = [(1.0, [source_id], [source_key])]
+    finished: List[tuple] = []
+    truncated = False
+    for _ in range(depth):
+        if (time.monotonic() - t0) * 1000.0 > budget_ms:
+            truncated = True
+            break
+        todo = sorted({ids[-1] for _, ids, _ in frontier} - adj.keys())
+        if todo:
+            adj.update(_out_edges(cur, todo, beam))
+        candidates = []
+        for prob, ids, keys in frontier:
+            steps = [e for e in adj.get(ids[-1], ()) if e[0] not in ids]
+            if not steps:
+                finished.append((prob, ids, keys))
+                continue
+            for target_id, target_key, p in steps:
+                candidates.append((prob * p, ids + [target_id], keys + [target_key]))
+        if not candidates:
+            frontier = []
+            break
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        frontier = candidates[:beam]
+
+    best = sorted(finished + frontier, key=lambda c: c[0], reverse=True)
+    paths = [{"keys": keys, "ids": ids, "probability": prob} for prob, ids, keys in best if len(ids) > 1][:k]
+    return {"paths": paths, "truncated": truncated, "ms": round((time.monotonic() - t0) * 1000.0, 2)}
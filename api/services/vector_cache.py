@@ -0,0 +1,156 @@
+"""Content-addressed cache of channel vectors.
+
+Channelizers are pure functions of the text, so their output is stored in
+``channel_vector`` keyed by (blake2b-128 of the UTF-8 text, channel,
+channelizer version). Ingest paths call ``cached_channels_batch`` (psycopg)
+or ``cached_channels_batch_async`` (asyncpg) in place of
+``run_channels_batch``: hits are read back in one query, only the misses are
+channelized, and those are written back for the next run. Bumping a
+channel's registered version (api.channelizers) orphans its old rows.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from psycopg.rows import tuple_row
+
+from api.channelizers import EMB_DIM, channel_names, channel_version, run_channels_batch
+from api.services import metrics
+
+
+CHANNEL_CACHE = os.getenv("CHANNEL_CACHE", "1") != "0"
+
+DDL = """
+CREATE TABLE IF NOT EXISTS channel_vector (
+    text_hash  BYTEA NOT NULL,
+    channel    TEXT NOT NULL,
+    version    TEXT NOT NULL,
+    features   VECTOR(384) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    PRIMARY KEY (text_hash, channel, version)
+)
+"""
+
+_SELECT = """
+SELECT cv.text_hash, cv.channel, cv.features::real[] AS features
+FROM channel_vector cv
+JOIN unnest({h}::bytea[]) AS h(text_hash) USING (text_hash)
+JOIN unnest({c}::text[], {v}::text[]) AS k(channel, version)
+  ON k.channel = cv.channel AND k.version = cv.version
+"""
+
+_INSERT = """
+INSERT INTO channel_vector (text_hash, channel, version, features)
+SELECT h, c, v, f::vector
+FROM unnest({h}::bytea[], {c}::text[], {v}::text[], {f}::text[]) AS u(h, c, v, f)
+ON CONFLICT DO NOTHING
+"""
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class _Plan:
+    """Bookkeeping shared by the sync and async lookups."""
+
+    def __init__(self, texts: Sequence[str], chosen: Optional[Iterable[str]]):
+        self.texts = list(texts)
+        self.channels = channel_names(chosen)
+        self.versions = [channel_version(ch) for ch in self.channels]
+        self.hashes = [text_hash(t) for t in self.texts]
+        # identical texts share one row in the unique set
+        self.unique: Dict[bytes, int] = {}
+        for h in self.hashes:
+            self.unique.setdefault(h, len(self.unique))
+        self.found: Dict[str, Dict[bytes, np.ndarray]] = {ch: {} for ch in self.channels}
+
+    def record_hits(self, rows: Iterable[Tuple[bytes, str, Sequence[float]]]) -> None:
+        for h, ch, features in rows:
+            self.found[ch][bytes(h)] = np.asarray(features, dtype=np.float32)
+
+    def misses(self) -> Tuple[List[bytes], List[str]]:
+        """Hashes (and their texts) missing from any requested channel."""
+        first = {}
+        for h, t in zip(self.hashes, self.texts):
+            first.setdefault(h, t)
+        miss = [h for h in self.unique if any(h not in self.found[ch] for ch in self.channels)]
+        return miss, [first[h] for h in miss]
+
+    def record_computed(self, miss: List[bytes], matrices: Dict[str, np.ndarray]) -> List[list]:
+        rows = []
+        for ch, version in zip(self.channels, self.versions):
+            matrix = matrices[ch]
+            for i, h in enumerate(miss):
+                if h in self.found[ch]:
+                    continue
+                self.found[ch][h] = matrix[i]
+                rows.append((h, ch, version, "[" + ",".join(map(str, matrix[i].tolist())) + "]"))
+        # a fixed key order keeps concurrent writers of overlapping texts from deadlocking
+        rows.sort(key=lambda r: (r[0], r[1]))
+        return [list(col) for col in zip(*rows)] if rows else [[], [], [], []]
+
+    def matrices(self) -> Dict[str, np.ndarray]:
+        out = {}
+        for ch in self.channels:
+            found = self.found[ch]
+            out[ch] = np.stack([found[h] for h in self.hashes]).astype(np.float32, copy=False) if self.hashes \
+                else np.zeros((0, EMB_DIM), dtype=np.float32)
+        return out
+
+
+def ensure_channel_vector_table(conn) -> None:
+    conn.execute(DDL)
+
+
+def cached_channels_batch(conn, texts: Sequence[str], chosen: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """run_channels_batch through the channel_vector cache on a psycopg connection."""
+    if not CHANNEL_CACHE:
+        return run_channels_batch(texts, chosen)
+    plan = _Plan(texts, chosen)
+    if not plan.channels or not plan.texts:
+        return run_channels_batch(texts, chosen)
+    with conn.cursor(row_factory=tuple_row) as cur:
+        with metrics.query("channel_vector_lookup"):
+            cur.execute(_SELECT.format(h="%s", c="%s", v="%s"), (list(plan.unique), plan.channels, plan.versions))
+            plan.record_hits(cur.fetchall())
+        miss, miss_texts = plan.misses()
+        if miss:
+            rows = plan.record_computed(miss, run_channels_batch(miss_texts, plan.channels))
+            with metrics.query("channel_vector_insert"):
+                cur.execute(_INSERT.format(h="%s", c="%s", v="%s", f="%s"), rows)
+    return plan.matrices()
+
+
+async def cached_channels_batch_async(
+    conn,
+    texts: Sequence[str],
+    chosen: Optional[Iterable[str]] = None,
+    compute: Optional[Callable[[List[str], List[str]], Awaitable[Dict[str, np.ndarray]]]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    asyncpg counterpart of cached_channels_batch. ``compute`` channelizes the
+    misses (e.g. in a process pool); by default they are computed inline.
+    """
+    if not CHANNEL_CACHE or not texts:
+        return await compute(list(texts), channel_names(chosen)) if compute else run_channels_batch(texts, chosen)
+    plan = _Plan(texts, chosen)
+    if not plan.channels:
+        return {}
+    with metrics.query("channel_vector_lookup"):
+        rows = await conn.fetch(_SELECT.format(h="$1", c="$2", v="$3"), list(plan.unique), plan.channels, plan.versions)
+    plan.record_hits(rows)
+    miss, miss_texts = plan.misses()
+    if miss:
+        if compute is not None:
+            computed = await compute(miss_texts, plan.channels)
+        else:
+            computed = run_channels_batch(miss_texts, plan.channels)
+        rows = plan.record_computed(miss, computed)
+        with metrics.query("channel_vector_insert"):
+            await conn.execute(_INSERT.format(h="$1", c="$2", v="$3", f="$4"), *rows)
+    return plan.matrices()
@@ -0,0 +1,210 @@
+"""Compiled ``rules`` documents for ``/xml/explode``.
+
+``compile_rules`` turns the JSON rules into ``etree.XPath`` objects with the
+namespaces bound, decides once per unit spec which values are XPath and
+which are constants, and fixes the parent-resolution strategy. Compiled sets
+are cached in an LRU keyed by a hash of the canonical JSON of the keys they
+are compiled from (``COMPILE_KEYS``), so repeated explodes with the same
+rules skip compilation entirely, whatever their stream or clear flags.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from lxml import etree
+
+from api.services.cache import LRUCache
+
+
+RULES_CACHE = LRUCache("xml_rules", maxsize=128, ttl=24 * 3600.0)
+
+XPATH_PREFIXES = (
+    "@",
+    "./",
+    "../",
+    ".//",
+    "//",
+    "normalize-space",
+    "string(",
+    "concat(",
+    "name(",
+)
+DEFAULT_TEXT_PATH = "normalize-space(.)"
+
+
+def looks_like_xpath(expr: Any) -> bool:
+    return isinstance(expr, str) and expr.startswith(XPATH_PREFIXES)
+
+
+def _to_int(x) -> Optional[int]:
+    try:
+        return int(x)
+    except (TypeError, ValueError):
+        return None
+
+
+def _coerce_value(val) -> Optional[str]:
+    if val is None:
+        return None
+    if isinstance(val, etree._Element):
+        text = val.text or ""
+        return text.strip() or None
+    if isinstance(val, bytes):
+        return val.decode("utf-8").strip() or None
+    text = str(val).strip()
+    return text or None
+
+
+def _stream_tag(expr: str) -> Optional[str]:
+    # streaming can only match plain element names: "verse", "//verse", ".//tei:l"
+    tag = expr.lstrip("./")
+    if not tag or any(c in tag for c in "/[]()@*|"):
+        return None
+    return tag.split(":")[-1]
+
+
+class _Compiler:
+    def __init__(self, namespaces: Optional[Dict[str, str]]):
+        self.namespaces = namespaces or None
+        self.seen: Dict[str, etree.XPath] = {}
+
+    def __call__(self, expr: str) -> etree.XPath:
+        xp = self.seen.get(expr)
+        if xp is None:
+            xp = etree.XPath(expr, namespaces=self.namespaces, smart_strings=False)
+            self.seen[expr] = xp
+        return xp
+
+
+class CompiledUnit:
+    """One entry of rules.units, ready for per-node evaluation."""
+
+    def __init__(self, spec: Dict[str, Any], xp: _Compiler):
+        self.spec = spec
+        self.kind: str = spec["kind"]
+        self.select = xp(spec["path"])
+        self.stream_tag = _stream_tag(spec["path"])
+
+        self.label_path = xp(spec["label_path"]) if spec.get("label_path") else None
+        label_attr = spec.get("label_attr")
+        self.label_attr = (label_attr[1:] if label_attr.startswith("@") else label_attr) if label_attr else None
+
+        # (key, XPath | None, constant-or-callable)
+        self.meta: List[Tuple[str, Optional[etree.XPath], Any]] = [
+            (key, xp(expr), None) if looks_like_xpath(expr) else (key, None, expr)
+            for key, expr in (spec.get("meta") or {}).items()
+        ]
+
+        ordinal_expr = spec.get("ordinal_path") or spec.get("ordinal")
+        self.ordinal_path = xp(ordinal_expr) if looks_like_xpath(ordinal_expr) else None
+        self.ordinal_const = None if ordinal_expr is None or self.ordinal_path is not None else _to_int(ordinal_expr)
+
+        self.text_path = xp(spec.get("text_path") or DEFAULT_TEXT_PATH)
+
+        self.path_scheme: Optional[str] = spec.get("path_scheme")
+        path_attr = spec.get("path_attr")
+        self.path_attr = (path_attr[1:] if path_attr.startswith("@") else path_attr) if path_attr else None
+        self.path_prefix: Optional[str] = spec.get("path_prefix")
+        self.path_pad = int(spec.get("path_pad", 3))
+
+        # parent strategy, tried in this order
+        self.parent_xpath = xp(spec["parent_xpath"]) if spec.get("parent_xpath") else None
+        parent_kinds = spec.get("parent_kind") or ()
+        self.parent_kinds: FrozenSet[str] = frozenset([parent_kinds] if isinstance(parent_kinds, str) else parent_kinds)
+        self.inherit_parent = bool(spec.get("inherit_parent"))
+
+        self.sentence_children = [c["kind"] for c in spec.get("children") or () if c.get("split") == "sentence"]
+
+    # --- per-node evaluation ---
+
+    @staticmethod
+    def collect(xpath: etree.XPath, node) -> List[str]:
+        result = xpath(node)
+        if isinstance(result, list):
+            return [v for v in map(_coerce_value, result) if v]
+        coerced = _coerce_value(result)
+        return [coerced] if coerced else []
+
+    def first(self, xpath: etree.XPath, node) -> Optional[str]:
+        vals = self.collect(xpath, node)
+        return vals[0] if vals else None
+
+    def label(self, node) -> Optional[str]:
+        if self.label_path is not None:
+            label = self.first(self.label_path, node)
+            if label:
+                return label
+        if self.label_attr:
+            val = node.get(self.label_attr)
+            if val and val.strip():
+                return val.strip()
+        return None
+
+    def meta_for(self, node) -> Dict[str, Any]:
+        meta = {}
+        for key, xpath, const in self.meta:
+            if xpath is not None:
+                val = self.first(xpath, node)
+            elif callable(const):
+                val = const(node)
+            else:
+                val = const
+            if val not in (None, ""):
+                meta[key] = val
+        return meta
+
+    def ordinal(self, node, counters: Dict[str, int]) -> int:
+        if self.ordinal_path is not None:
+            ordinal = _to_int(self.first(self.ordinal_path, node))
+        else:
+            ordinal = self.ordinal_const
+        if ordinal is None:
+            counters[self.kind] += 1
+            ordinal = counters[self.kind]
+        else:
+            counters[self.kind] = max(counters[self.kind], ordinal)
+        return ordinal
+
+    def text(self, node) -> Optional[str]:
+        vals = self.collect(self.text_path, node)
+        return " ".join(vals) if vals else None
+
+
+class CompiledRules:
+    def __init__(self, rules: Dict[str, Any]):
+        xp = _Compiler(rules.get("namespaces"))
+        self.root_path: str = rules.get("root_path", "/")
+        self.root = xp(self.root_path)
+        self.path_scheme: Optional[str] = rules.get("path_scheme")
+        self.path_prefix: Optional[str] = rules.get("path_prefix")
+        self.units = [CompiledUnit(spec, xp) for spec in rules.get("units") or []]
+        # kinds some unit may attach to; nodes of other kinds need no id lookup entry
+        self.parent_kinds = frozenset().union(*(u.parent_kinds for u in self.units)) if self.units else frozenset()
+        self.any_inherit = any(u.inherit_parent or u.parent_xpath is not None for u in self.units)
+
+
+# the only rules keys CompiledRules reads; flags like stream or clear_existing must not split the cache
+COMPILE_KEYS = ("namespaces", "root_path", "path_scheme", "path_prefix", "units")
+
+
+def rules_hash(rules: Dict[str, Any]) -> Optional[str]:
+    try:
+        canonical = json.dumps({k: rules.get(k) for k in COMPILE_KEYS}, sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return None   # callables or other non-JSON values: compile without caching
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def compile_rules(rules: Dict[str, Any]) -> CompiledRules:
+    """Compile rules, reusing a cached compilation for identical rules."""
+    key = rules_hash(rules)
+    if key is None:
+        return CompiledRules(rules)
+    compiled = RULES_CACHE.get(key)
+    if compiled is None:
+        compiled = CompiledRules(rules)
+        RULES_CACHE.put(key, compiled)
+    return compiled
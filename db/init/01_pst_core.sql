@@ -9,6 +9,8 @@ CREATE TABLE IF NOT EXISTS concept (
   embedding  vector(1536),          -- you can ALTER to vector(384) later
   created_at TIMESTAMPTZ DEFAULT now()
 );
+-- ANN over concept embeddings (/predict/next?mode=vector|blend)
+CREATE INDEX IF NOT EXISTS concept_emb_ivf ON concept USING ivfflat (embedding vector_l2_ops) WITH (lists = 100);
 
 -- Observations: raw sequences per session (provenance)
 CREATE TABLE IF NOT EXISTS observation (
@@ -34,6 +36,7 @@ CREATE TABLE IF NOT EXISTS trajectory (
 );
 CREATE INDEX IF NOT EXISTS traj_source_idx ON trajectory (source_id);
 CREATE INDEX IF NOT EXISTS traj_target_idx ON trajectory (target_id);
+CREATE UNIQUE INDEX IF NOT EXISTS traj_pair_uq ON trajectory (source_id, target_id);
 CREATE INDEX IF NOT EXISTS traj_delta_ivf ON trajectory USING ivfflat (delta vector_l2_ops) WITH (lists = 100);
 
 -- Optional ring registry (R1/R2/R3 bookkeeping)
@@ -0,0 +1,16 @@
+-- Background job queue (consumed by worker/worker.py; see api/services/jobs.py)
+CREATE TABLE IF NOT EXISTS job (
+  id               BIGSERIAL PRIMARY KEY,
+  kind             TEXT NOT NULL,                 -- ingest_unit|xml_explode|jsonl_explode|process_corpus
+  params           JSONB NOT NULL DEFAULT '{}'::jsonb,
+  state            TEXT NOT NULL DEFAULT 'queued', -- queued|running|done|failed|cancelled
+  progress         JSONB DEFAULT '{}'::jsonb,     -- {"done": n, "total": m, "stage": ...}
+  result           JSONB,
+  error            TEXT,
+  cancel_requested BOOLEAN NOT NULL DEFAULT false,
+  worker           TEXT,
+  created_at       TIMESTAMPTZ DEFAULT now(),
+  started_at       TIMESTAMPTZ,
+  finished_at      TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS job_queued_idx ON job (id) WHERE state = 'queued';
\ No newline at end of file
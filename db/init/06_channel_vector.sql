@@ -0,0 +1,9 @@
+-- Content-addressed channel vector cache (see api/services/vector_cache.py)
+CREATE TABLE IF NOT EXISTS channel_vector (
+  text_hash  BYTEA NOT NULL,               -- blake2b-128 of the UTF-8 text
+  channel    TEXT NOT NULL,
+  version    TEXT NOT NULL,                -- Channelizer.version (api/channelizers.py)
+  features   VECTOR(384) NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT now(),
+  PRIMARY KEY (text_hash, channel, version)
+);
@@ -0,0 +1,34 @@
+-- Compact storage for sparse channels (run once, then set COMPACT_CHANNELS=rhetoric,imagery).
+-- rhetoric fills 12 of its 384 dimensions and imagery 6; stored at their true width the
+-- rows shrink from ~1.5 kB to under 64 bytes. Queries that need 384-d vectors read
+-- move_v384 / move_edge_v384 or wrap the column in pst_pad384() (db/sql/pst_merge_ddl.sql 3b).
+
+BEGIN;
+
+-- dependants of the retyped columns; re-run db/sql/pst_merge_ddl.sql afterwards to restore them
+DROP VIEW  IF EXISTS public.move_v384, public.move_edge_v384;
+DROP INDEX IF EXISTS move_edge_delta_hnsw;
+
+-- columns created by older ensure_pst_tables() were typed vector(384)
+ALTER TABLE public."move"      ALTER COLUMN features TYPE vector;
+ALTER TABLE public.move_edge   ALTER COLUMN delta    TYPE vector;
+ALTER TABLE public.curvature_multi
+  ALTER COLUMN da TYPE vector,
+  ALTER COLUMN db TYPE vector;
+
+-- rewrite existing rows so each channel has a single width
+UPDATE public."move"    SET features = (features::real[])[1:12]::vector WHERE channel = 'rhetoric' AND vector_dims(features) > 12;
+UPDATE public."move"    SET features = (features::real[])[1:6]::vector  WHERE channel = 'imagery'  AND vector_dims(features) > 6;
+UPDATE public.move_edge SET delta    = (delta::real[])[1:12]::vector    WHERE channel = 'rhetoric' AND vector_dims(delta) > 12;
+UPDATE public.move_edge SET delta    = (delta::real[])[1:6]::vector     WHERE channel = 'imagery'  AND vector_dims(delta) > 6;
+UPDATE public.curvature_multi SET da = (da::real[])[1:12]::vector WHERE ch_a = 'rhetoric' AND vector_dims(da) > 12;
+UPDATE public.curvature_multi SET da = (da::real[])[1:6]::vector  WHERE ch_a = 'imagery'  AND vector_dims(da) > 6;
+UPDATE public.curvature_multi SET db = (db::real[])[1:12]::vector WHERE ch_b = 'rhetoric' AND vector_dims(db) > 12;
+UPDATE public.curvature_multi SET db = (db::real[])[1:6]::vector  WHERE ch_b = 'imagery'  AND vector_dims(db) > 6;
+
+COMMIT;
+
+-- reclaim the space
+VACUUM FULL public."move";
+VACUUM FULL public.move_edge;
+VACUUM FULL public.curvature_multi;
@@ -22,6 +22,51 @@ BEGIN
   END IF;
 END $$;
 
+-- 2b) curvature_multi as a stable table (maintained incrementally, see 5)
+CREATE TABLE IF NOT EXISTS public.curvature_multi (
+  session_id TEXT,
+  domain     TEXT,
+  ch_a       TEXT,
+  ch_b       TEXT,
+  s_sent     INT,
+  t_sent     INT,
+  da         vector,
+  db         vector,
+  weight     DOUBLE PRECISION,
+  frame_a    INT,
+  frame_b    INT,
+  edge_a     BIGINT REFERENCES public.move_edge(id) ON DELETE CASCADE,
+  edge_b     BIGINT REFERENCES public.move_edge(id) ON DELETE CASCADE
+);
+ALTER TABLE public.curvature_multi
+  ADD COLUMN IF NOT EXISTS edge_a BIGINT REFERENCES public.move_edge(id) ON DELETE CASCADE,
+  ADD COLUMN IF NOT EXISTS edge_b BIGINT REFERENCES public.move_edge(id) ON DELETE CASCADE;
+CREATE UNIQUE INDEX IF NOT EXISTS curvature_multi_edges_uq ON public.curvature_multi (edge_a, edge_b);
+CREATE INDEX IF NOT EXISTS curvature_multi_dom_idx ON public.curvature_multi (domain);
+
+-- edges waiting to be folded into curvature_multi by refresh_curvature_multi();
+-- worker/worker.py drains it every step
+CREATE TABLE IF NOT EXISTS public.curvature_pending (
+  edge_id   BIGINT PRIMARY KEY,
+  queued_at TIMESTAMPTZ DEFAULT now()
+);
+
+-- per (domain, channel pair, frame pair) totals over curvature_multi, kept in step by
+-- the triggers in 5d; /curvature/top reads this instead of aggregating curvature_multi.
+-- NULLS NOT DISTINCT (PG15+): rows without a domain or frame roll up together.
+CREATE TABLE IF NOT EXISTS public.curvature_rollup (
+  domain  TEXT,
+  ch_a    TEXT,
+  ch_b    TEXT,
+  frame_a INT,
+  frame_b INT,
+  n       BIGINT NOT NULL DEFAULT 0,              -- curvature rows
+  w_n     BIGINT NOT NULL DEFAULT 0,              -- rows with a weight (AVG skips NULLs)
+  w_sum   DOUBLE PRECISION NOT NULL DEFAULT 0,
+  CONSTRAINT curvature_rollup_key UNIQUE NULLS NOT DISTINCT (domain, ch_a, ch_b, frame_a, frame_b)
+);
+CREATE INDEX IF NOT EXISTS curvature_rollup_frame_idx ON public.curvature_rollup (frame_a, frame_b);
+
 -- 3) Helpful indexes (speed up common queries)
 CREATE INDEX IF NOT EXISTS move_frame_idx      ON public."move"(frame_id);
 CREATE INDEX IF NOT EXISTS moveedge_frame_idx  ON public.move_edge(frame_id);
@@ -30,6 +75,28 @@ CREATE INDEX IF NOT EXISTS truth_framepair_idx ON public.truth(frame_pair);
 CREATE INDEX IF NOT EXISTS posit_author_idx    ON public.posit(author_id);
 CREATE INDEX IF NOT EXISTS eval_posit_idx      ON public.evaluation(posit_id);
 
+-- 3a) channelizer version that produced each move (Channelizer.version in api/channelizers.py)
+ALTER TABLE public."move" ADD COLUMN IF NOT EXISTS channel_version TEXT;
+
+-- 3b) 384-d view over compact channel storage (COMPACT_CHANNELS, see db/sql/compact_channel_storage.sql)
+-- Compact rows hold only the dimensions a channel fills; pst_pad384 zero-pads them back.
+CREATE OR REPLACE FUNCTION pst_pad384(v vector) RETURNS vector(384)
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+  SELECT CASE WHEN vector_dims(v) >= 384 THEN v::vector(384)
+              ELSE array_cat(v::real[], array_fill(0::real, ARRAY[384 - vector_dims(v)]))::vector(384)
+         END
+$$;
+
+CREATE OR REPLACE VIEW public.move_v384 AS
+  SELECT id, session_id, domain, channel, span, pst_pad384(features) AS features, created_at, frame_id,
+         channel_version
+  FROM public."move";
+
+CREATE OR REPLACE VIEW public.move_edge_v384 AS
+  SELECT id, source_move, target_move, channel, pst_pad384(delta) AS delta,
+         weight, freq, last_seen, context, frame_id
+  FROM public.move_edge;
+
 -- 4) Evidence-driven recompute of move_edge.weight (no wall-clock decay)
 CREATE OR REPLACE FUNCTION recompute_move_edge_v2() RETURNS void
 LANGUAGE plpgsql AS $$
@@ -72,12 +139,219 @@ BEGIN
   WHERE e.id = s.id;
 END $$;
 
--- 5) Curvature rebuild (derives from move_edge + move; includes frames)
+-- 4b) Opposition scoring via ANN neighbours (replaces the O(E²) opp self-join at scale)
+-- Each edge is compared only with its p_k nearest neighbours to the *negated* delta,
+-- i.e. the candidates most likely to oppose it, found through the HNSW index.
+DROP INDEX IF EXISTS move_edge_delta_hnsw;   -- cast-based; rejects compact rows
+CREATE INDEX IF NOT EXISTS move_edge_delta_pad_hnsw
+  ON public.move_edge USING hnsw (pst_pad384(delta) vector_ip_ops);
+CREATE INDEX IF NOT EXISTS move_edge_channel_id_idx ON public.move_edge (channel, id);
+
+CREATE TABLE IF NOT EXISTS public.move_edge_opp (
+  edge_id   BIGINT PRIMARY KEY REFERENCES public.move_edge(id) ON DELETE CASCADE,
+  oppose    INT NOT NULL,
+  scored_at TIMESTAMPTZ DEFAULT now()
+);
+
+-- CALL score_move_edge_opposition();            -- all channels
+-- CALL score_move_edge_opposition('imagery', 64); -- one channel, wider neighbourhood
+CREATE OR REPLACE PROCEDURE score_move_edge_opposition(
+  p_channel TEXT DEFAULT NULL,
+  p_k       INT  DEFAULT 32,
+  p_chunk   INT  DEFAULT 2000
+)
+LANGUAGE plpgsql AS $$
+DECLARE
+  ch      TEXT;
+  last_id BIGINT;
+  hi      BIGINT;
+  total   BIGINT;
+  done    BIGINT;
+  n       BIGINT;
+BEGIN
+  FOR ch IN
+    SELECT DISTINCT channel FROM move_edge
+    WHERE p_channel IS NULL OR channel = p_channel
+    ORDER BY 1
+  LOOP
+    SELECT COUNT(*) INTO total FROM move_edge WHERE channel = ch;
+    last_id := 0;
+    done := 0;
+    LOOP
+      SELECT MAX(id) INTO hi FROM (
+        SELECT id FROM move_edge
+        WHERE channel = ch AND id > last_id
+        ORDER BY id
+        LIMIT p_chunk
+      ) c;
+      EXIT WHEN hi IS NULL;
+
+      PERFORM set_config('hnsw.ef_search', GREATEST(40, p_k)::text, true);
+      INSERT INTO move_edge_opp (edge_id, oppose, scored_at)
+      SELECT e1.id,
+             COUNT(nb.neg_ip) FILTER (WHERE nb.neg_ip > 0),   -- same test as v2: cosine < 0
+             now()
+      FROM move_edge e1
+      LEFT JOIN LATERAL (
+        SELECT e1.delta <#> e2.delta AS neg_ip
+        FROM move_edge e2
+        WHERE e2.channel = e1.channel
+          AND e2.id <> e1.id
+        -- (d - d) - d = -d: pgvector has no unary minus
+        ORDER BY pst_pad384(e2.delta) <#> pst_pad384((e1.delta - e1.delta) - e1.delta)
+        LIMIT p_k
+      ) nb ON true
+      WHERE e1.channel = ch
+        AND e1.id > last_id
+        AND e1.id <= hi
+      GROUP BY e1.id
+      ON CONFLICT (edge_id) DO UPDATE
+      SET oppose = EXCLUDED.oppose,
+          scored_at = EXCLUDED.scored_at;
+
+      GET DIAGNOSTICS n = ROW_COUNT;
+      done := done + n;
+      last_id := hi;
+      RAISE NOTICE 'opposition %: % / % edges', ch, done, total;
+      COMMIT;
+    END LOOP;
+  END LOOP;
+END $$;
+
+-- 4c) Same evidence-driven weight as recompute_move_edge_v2, reading the scored opposition.
+-- Run CALL score_move_edge_opposition() first.
+CREATE OR REPLACE FUNCTION recompute_move_edge_ann() RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+  WITH basis AS (
+    SELECT
+      e.id,
+      e.freq,
+      ms.session_id,
+      (ms.span->>'sent')::int AS s_sent,
+      (mt.span->>'sent')::int AS t_sent,
+      e.channel
+    FROM move_edge e
+    JOIN "move" ms ON ms.id = e.source_move
+    JOIN "move" mt ON mt.id = e.target_move
+  ),
+  siblings AS (
+    SELECT
+      b.*,
+      COUNT(*) OVER (PARTITION BY session_id, s_sent, t_sent, channel) AS siblings_cnt
+    FROM basis b
+  )
+  UPDATE move_edge e
+  SET weight = LEAST(1.0,
+              (0.60 * (1 - exp(-0.20 * GREATEST(e.freq,1)))) +           -- recurrence
+              (0.25 * (1 - exp(-0.50 * GREATEST(s.siblings_cnt-1,0))))   -- local diversity
+            ) * exp(-0.30 * COALESCE(o.oppose,0)),                       -- conflict penalty
+      last_seen = now()
+  FROM siblings s
+  LEFT JOIN move_edge_opp o ON o.edge_id = s.id
+  WHERE e.id = s.id;
+END $$;
+
+-- 5) Curvature maintenance (derives from move_edge + move; includes frames)
+-- 5a. queue edges as they are inserted or re-weighted (statement-level, so COPY stays cheap)
+CREATE OR REPLACE FUNCTION curvature_enqueue_inserted() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO public.curvature_pending (edge_id)
+  SELECT id FROM new_edges
+  ON CONFLICT DO NOTHING;
+  RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION curvature_enqueue_reweighted() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO public.curvature_pending (edge_id)
+  SELECT n.id
+  FROM new_edges n JOIN old_edges o ON o.id = n.id
+  WHERE n.weight IS DISTINCT FROM o.weight
+  ON CONFLICT DO NOTHING;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS move_edge_curvature_ins ON public.move_edge;
+CREATE TRIGGER move_edge_curvature_ins
+  AFTER INSERT ON public.move_edge
+  REFERENCING NEW TABLE AS new_edges
+  FOR EACH STATEMENT EXECUTE FUNCTION curvature_enqueue_inserted();
+
+DROP TRIGGER IF EXISTS move_edge_curvature_upd ON public.move_edge;
+CREATE TRIGGER move_edge_curvature_upd
+  AFTER UPDATE ON public.move_edge
+  REFERENCING OLD TABLE AS old_edges NEW TABLE AS new_edges
+  FOR EACH STATEMENT EXECUTE FUNCTION curvature_enqueue_reweighted();
+
+-- 5b. incremental refresh: recompute only the boundaries touched by queued edges.
+-- Readers of curvature_multi are never blocked; p_limit bounds one call's work.
+CREATE OR REPLACE FUNCTION refresh_curvature_multi(p_limit INT DEFAULT NULL)
+RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE n INT;
+BEGIN
+  WITH batch AS (
+    DELETE FROM public.curvature_pending
+    WHERE edge_id IN (
+      SELECT edge_id FROM public.curvature_pending
+      ORDER BY edge_id
+      LIMIT p_limit
+      FOR UPDATE SKIP LOCKED
+    )
+    RETURNING edge_id
+  ),
+  touched AS (
+    SELECT DISTINCT e.source_move, e.target_move
+    FROM batch b
+    JOIN move_edge e ON e.id = b.edge_id
+  )
+  INSERT INTO public.curvature_multi
+    (session_id, domain, ch_a, ch_b, s_sent, t_sent, da, db, weight, frame_a, frame_b, edge_a, edge_b)
+  SELECT
+    ms.session_id,
+    ms.domain,
+    e1.channel,
+    e2.channel,
+    (ms.span->>'sent')::int,
+    (mt.span->>'sent')::int,
+    e1.delta,
+    e2.delta,
+    ((e1.weight + e2.weight)/2.0),
+    ms.frame_id,
+    ms.frame_id,
+    e1.id,
+    e2.id
+  FROM touched t
+  JOIN move_edge e1
+    ON e1.source_move = t.source_move
+   AND e1.target_move = t.target_move
+  JOIN move_edge e2
+    ON e2.source_move = t.source_move
+   AND e2.target_move = t.target_move
+   AND e1.channel <> e2.channel
+  JOIN "move" ms ON ms.id = e1.source_move
+  JOIN "move" mt ON mt.id = e1.target_move
+  ON CONFLICT (edge_a, edge_b) DO UPDATE
+  SET weight  = EXCLUDED.weight,
+      da      = EXCLUDED.da,
+      db      = EXCLUDED.db,
+      frame_a = EXCLUDED.frame_a,
+      frame_b = EXCLUDED.frame_b;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END $$;
+
+-- 5c. full resync; replaces rows in place so readers keep the old snapshot until commit
 CREATE OR REPLACE FUNCTION rebuild_curvature_multi() RETURNS void
 LANGUAGE plpgsql AS $$
 BEGIN
-  DROP TABLE IF EXISTS public.curvature_multi;
-  CREATE TABLE public.curvature_multi AS
+  DELETE FROM public.curvature_pending;
+  DELETE FROM public.curvature_multi;
+  INSERT INTO public.curvature_multi
+    (session_id, domain, ch_a, ch_b, s_sent, t_sent, da, db, weight, frame_a, frame_b, edge_a, edge_b)
   SELECT
     ms.session_id,
     ms.domain,
@@ -89,7 +363,9 @@ BEGIN
     e2.delta AS db,
     ((e1.weight + e2.weight)/2.0) AS weight,
     ms.frame_id AS frame_a,
-    ms.frame_id AS frame_b   -- source frames for both edges (same boundary, different channels)
+    ms.frame_id AS frame_b,  -- source frames for both edges (same boundary, different channels)
+    e1.id AS edge_a,
+    e2.id AS edge_b
   FROM move_edge e1
   JOIN move_edge e2
     ON e1.source_move = e2.source_move
@@ -97,11 +373,86 @@ BEGIN
    AND e1.channel <> e2.channel
   JOIN "move" ms ON ms.id = e1.source_move
   JOIN "move" mt ON mt.id = e1.target_move;
+END $$;
+
+-- 5d. curvature_rollup maintenance: statement-level triggers fold each statement's
+-- changed rows into the totals as +/- deltas, so refresh, rebuild and cascaded
+-- deletes from move_edge all keep it current.
+CREATE OR REPLACE FUNCTION curvature_rollup_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE src TEXT;
+BEGIN
+  -- transition tables exist only for the events that declare them, hence EXECUTE
+  src := CASE TG_OP
+    WHEN 'INSERT' THEN 'SELECT domain, ch_a, ch_b, frame_a, frame_b, weight, 1 AS s FROM new_rows'
+    WHEN 'DELETE' THEN 'SELECT domain, ch_a, ch_b, frame_a, frame_b, weight, -1 AS s FROM old_rows'
+    ELSE 'SELECT domain, ch_a, ch_b, frame_a, frame_b, weight, 1 AS s FROM new_rows
+          UNION ALL
+          SELECT domain, ch_a, ch_b, frame_a, frame_b, weight, -1 FROM old_rows'
+  END;
+  EXECUTE format($q$
+    INSERT INTO public.curvature_rollup AS r (domain, ch_a, ch_b, frame_a, frame_b, n, w_n, w_sum)
+    SELECT domain, ch_a, ch_b, frame_a, frame_b,
+           sum(s),
+           COALESCE(sum(s) FILTER (WHERE weight IS NOT NULL), 0),
+           COALESCE(sum(s * weight), 0)
+    FROM (%s) d
+    GROUP BY domain, ch_a, ch_b, frame_a, frame_b
+    ORDER BY domain, ch_a, ch_b, frame_a, frame_b   -- same row lock order in every writer
+    ON CONFLICT (domain, ch_a, ch_b, frame_a, frame_b) DO UPDATE
+    SET n     = r.n + EXCLUDED.n,
+        w_n   = r.w_n + EXCLUDED.w_n,
+        w_sum = r.w_sum + EXCLUDED.w_sum
+  $q$, src);
+  DELETE FROM public.curvature_rollup WHERE n <= 0;
+  RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION curvature_rollup_truncate() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  DELETE FROM public.curvature_rollup;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS curvature_rollup_ins ON public.curvature_multi;
+CREATE TRIGGER curvature_rollup_ins
+  AFTER INSERT ON public.curvature_multi
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION curvature_rollup_apply();
+
+DROP TRIGGER IF EXISTS curvature_rollup_upd ON public.curvature_multi;
+CREATE TRIGGER curvature_rollup_upd
+  AFTER UPDATE ON public.curvature_multi
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION curvature_rollup_apply();
+
+DROP TRIGGER IF EXISTS curvature_rollup_del ON public.curvature_multi;
+CREATE TRIGGER curvature_rollup_del
+  AFTER DELETE ON public.curvature_multi
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION curvature_rollup_apply();
 
-  CREATE INDEX IF NOT EXISTS curvature_multi_dom_idx   ON public.curvature_multi (domain);
-  CREATE INDEX IF NOT EXISTS curvature_multi_frame_idx ON public.curvature_multi (frame_a, frame_b);
+DROP TRIGGER IF EXISTS curvature_rollup_trunc ON public.curvature_multi;
+CREATE TRIGGER curvature_rollup_trunc
+  AFTER TRUNCATE ON public.curvature_multi
+  FOR EACH STATEMENT EXECUTE FUNCTION curvature_rollup_truncate();
+
+-- full resync of the totals (first install, or to shed float drift after long uptimes)
+CREATE OR REPLACE FUNCTION rebuild_curvature_rollup() RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+  -- holds off curvature_multi writers so no delta is counted twice or lost
+  LOCK TABLE public.curvature_multi IN SHARE MODE;
+  DELETE FROM public.curvature_rollup;
+  INSERT INTO public.curvature_rollup (domain, ch_a, ch_b, frame_a, frame_b, n, w_n, w_sum)
+  SELECT domain, ch_a, ch_b, frame_a, frame_b, count(*), count(weight), COALESCE(sum(weight), 0)
+  FROM public.curvature_multi
+  GROUP BY domain, ch_a, ch_b, frame_a, frame_b;
 END $$;
 
+SELECT rebuild_curvature_rollup();
+
 -- 6) Cross-domain/channel truth promoter (parameterized threshold), writes into YOUR 'truth'
 -- Uses psql -v min_weight=0.30 to pass threshold; defaults to 0.30 if not provided.
 -- For server-side calls we wrap with a stable default.
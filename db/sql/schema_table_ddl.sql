@@ -1,3 +1,19 @@
+-- public.channel_vector definition
+
+-- Drop table
+
+-- DROP TABLE public.channel_vector;
+
+CREATE TABLE public.channel_vector (
+	text_hash bytea NOT NULL,
+	channel text NOT NULL,
+	"version" text NOT NULL,
+	features public.vector(384) NOT NULL,
+	created_at timestamptz DEFAULT now() NULL,
+	CONSTRAINT channel_vector_pkey PRIMARY KEY (text_hash, channel, version)
+);
+
+
 -- public.concept definition
 
 -- Drop table
@@ -13,6 +29,7 @@ CREATE TABLE public.concept (
 	CONSTRAINT concept_key_key UNIQUE (key),
 	CONSTRAINT concept_pkey PRIMARY KEY (id)
 );
+CREATE INDEX concept_emb_ivf ON public.concept USING ivfflat (embedding) WITH (lists='100');
 
 
 -- public.corpus_jsonl definition
@@ -67,12 +84,35 @@ CREATE TABLE public.curvature_multi (
 	db public.vector NULL,
 	weight float8 NULL,
 	frame_a int4 NULL,
-	frame_b int4 NULL
+	frame_b int4 NULL,
+	edge_a int8 NULL,
+	edge_b int8 NULL
 );
 CREATE INDEX curvature_multi_dom_idx ON public.curvature_multi USING btree (domain);
+CREATE UNIQUE INDEX curvature_multi_edges_uq ON public.curvature_multi USING btree (edge_a, edge_b);
 CREATE INDEX curvature_multi_frame_idx ON public.curvature_multi USING btree (frame_a, frame_b);
 
 
+-- public.curvature_rollup definition
+
+-- Drop table
+
+-- DROP TABLE public.curvature_rollup;
+
+CREATE TABLE public.curvature_rollup (
+	"domain" text NULL,
+	ch_a text NULL,
+	ch_b text NULL,
+	frame_a int4 NULL,
+	frame_b int4 NULL,
+	n int8 DEFAULT 0 NOT NULL,
+	w_n int8 DEFAULT 0 NOT NULL,
+	w_sum float8 DEFAULT 0 NOT NULL,
+	CONSTRAINT curvature_rollup_key UNIQUE NULLS NOT DISTINCT (domain, ch_a, ch_b, frame_a, frame_b)
+);
+CREATE INDEX curvature_rollup_frame_idx ON public.curvature_rollup USING btree (frame_a, frame_b);
+
+
 -- public.persona definition
 
 -- Drop table
@@ -201,6 +241,7 @@ CREATE TABLE public."move" (
 	session_id text NULL,
 	"domain" text NULL,
 	channel text NULL,
+	channel_version text NULL,
 	span jsonb NULL,
 	features public.vector NULL,
 	created_at timestamptz DEFAULT now() NULL,
@@ -322,6 +363,7 @@ CREATE TABLE public.trajectory (
 CREATE INDEX traj_delta_ivf ON public.trajectory USING ivfflat (delta) WITH (lists='100');
 CREATE INDEX traj_source_idx ON public.trajectory USING btree (source_id);
 CREATE INDEX traj_target_idx ON public.trajectory USING btree (target_id);
+CREATE UNIQUE INDEX traj_pair_uq ON public.trajectory USING btree (source_id, target_id);
 
 
 -- public.truth_lineage definition
@@ -0,0 +1,30 @@
+-- trajectory_pair_unique.sql
+-- Collapses duplicate (source_id, target_id) trajectory rows left by the old
+-- per-transition /observe path, then adds the unique index its upsert needs.
+BEGIN;
+
+WITH agg AS (
+  SELECT source_id, target_id,
+         MIN(id)        AS keep_id,
+         SUM(freq)      AS freq,
+         MAX(last_seen) AS last_seen
+  FROM trajectory
+  GROUP BY source_id, target_id
+  HAVING COUNT(*) > 1
+)
+UPDATE trajectory t
+SET freq = a.freq,
+    weight = 1 - exp(-0.15 * a.freq),
+    last_seen = a.last_seen
+FROM agg a
+WHERE t.id = a.keep_id;
+
+DELETE FROM trajectory t
+USING trajectory k
+WHERE k.source_id = t.source_id
+  AND k.target_id = t.target_id
+  AND k.id < t.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS traj_pair_uq ON trajectory (source_id, target_id);
+
+COMMIT;
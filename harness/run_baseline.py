@@ -0,0 +1,45 @@
+"""Store the baseline that later benchmark runs are scored against.
+
+Baselines are kept per label in ``harness/results/baseline.json``, so a Pi
+and a workstation each compare against their own numbers.
+
+    python -m harness.run_baseline --label pi5 --scale 0.5   # run the suite, store it
+    python -m harness.run_baseline --promote latest          # adopt a run from history.json
+
+Takes the same options as ``harness.run_pst``.
+"""
+
+from __future__ import annotations
+
+import sys
+from typing import List, Optional
+
+from harness import run_pst, score
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = run_pst.build_parser("Run the PST benchmark suite and store it as the baseline.")
+    p.add_argument("--promote", metavar="RUN_ID", help="store a run from history.json ('latest' for the last one)")
+    args = p.parse_args(argv)
+
+    if args.promote:
+        history = score.load_history(args.results)
+        runs = history[-1:] if args.promote == "latest" else [r for r in history if r["run_id"] == args.promote]
+        if not runs:
+            print(f"no run {args.promote} in {args.results}/history.json", file=sys.stderr)
+            return 2
+        run = runs[-1]
+    else:
+        run = run_pst.run_suite(args)
+        run["baseline_run"] = None
+        run["regressions"] = []
+        score.append_history(args.results, run)
+
+    score.store_baseline(args.results, run)
+    score.report(run, None)
+    print(f"stored baseline {run['run_id']} for label {run['label']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Regression scoring for benchmark runs.
+
+A run (see ``harness.run_pst``) maps ``case/stage`` to latency percentiles
+and throughput. ``compare`` checks it against the stored baseline for the
+same label: a stage regresses when its p50 or p95 latency rises, or its
+throughput falls, by more than the tolerance. Latency changes smaller than
+``MIN_MS`` are ignored so sub-millisecond stages do not flap. p99 is
+recorded but not scored; on a handful of samples it is the maximum.
+
+    python -m harness.score                  # latest run vs. its baseline
+    python -m harness.score --run 20250101T120000 --tolerance 0.2
+
+Exits 1 when the scored run has regressions.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+
+TOLERANCE = 0.15
+MIN_MS = 2.0
+LATENCY_FIELDS = ("p50_ms", "p95_ms")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS = os.path.join(HERE, "results")
+
+
+def _read(path: str, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def _write(path: str, data) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def load_history(results: str) -> List[Dict[str, Any]]:
+    return _read(os.path.join(results, "history.json"), [])
+
+
+def append_history(results: str, run: Dict[str, Any]) -> None:
+    history = load_history(results)
+    history.append(run)
+    _write(os.path.join(results, "history.json"), history)
+
+
+def load_baseline(results: str, label: str) -> Optional[Dict[str, Any]]:
+    return _read(os.path.join(results, "baseline.json"), {}).get(label)
+
+
+def store_baseline(results: str, run: Dict[str, Any]) -> None:
+    path = os.path.join(results, "baseline.json")
+    baselines = _read(path, {})
+    baselines[run["label"]] = run
+    _write(path, baselines)
+
+
+def compare(run: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = TOLERANCE) -> List[Dict[str, Any]]:
+    """Stages of ``run`` that are worse than ``baseline`` beyond ``tolerance``."""
+    flags = []
+    for name, cur in sorted(run["stages"].items()):
+        base = baseline["stages"].get(name)
+        if not base:
+            continue
+        for field in LATENCY_FIELDS:
+            b, c = base.get(field), cur.get(field)
+            if b and c is not None and c - b > MIN_MS and c > b * (1.0 + tolerance):
+                flags.append({"stage": name, "field": field, "baseline": b, "current": c,
+                              "change": round(c / b - 1.0, 4)})
+        b, c = base.get("throughput"), cur.get("throughput")
+        if b and c is not None and c < b * (1.0 - tolerance):
+            flags.append({"stage": name, "field": "throughput", "baseline": b, "current": c,
+                          "change": round(c / b - 1.0, 4)})
+    return flags
+
+
+def _pct(cur, base) -> str:
+    if not base or cur is None:
+        return ""
+    return f"{(cur / base - 1.0) * 100.0:+.1f}%"
+
+
+def report(run: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"run {run['run_id']} label={run['label']} git={run.get('git')} scale={run['scale']}"
+          + (f" vs baseline {baseline['run_id']} git={baseline.get('git')}" if baseline else " (no baseline)"))
+    if baseline and baseline.get("scale") != run.get("scale"):
+        print(f"warning: baseline scale {baseline.get('scale')} differs from run scale {run.get('scale')}")
+    flagged = {(f["stage"], f["field"]) for f in run.get("regressions") or ()}
+    print(f"{'stage':40s} {'p50_ms':>10s} {'p95_ms':>10s} {'p99_ms':>10s} {'throughput':>14s}")
+    for name, cur in sorted(run["stages"].items()):
+        base = (baseline or {}).get("stages", {}).get(name) or {}
+        cells = []
+        for field in ("p50_ms", "p95_ms", "p99_ms", "throughput"):
+            mark = "!" if (name, field) in flagged else " "
+            cells.append(f"{cur.get(field) or 0:>9.2f}{mark}")
+        print(f"{name:40s} {cells[0]} {cells[1]} {cells[2]} {cells[3]:>13s} {cur['unit']}/s")
+        if base:
+            print(f"{'':40s} {_pct(cur.get('p50_ms'), base.get('p50_ms')):>10s} "
+                  f"{_pct(cur.get('p95_ms'), base.get('p95_ms')):>10s} "
+                  f"{_pct(cur.get('p99_ms'), base.get('p99_ms')):>10s} "
+                  f"{_pct(cur.get('throughput'), base.get('throughput')):>14s}")
+    for f in run.get("regressions") or ():
+        print(f"REGRESSION {f['stage']} {f['field']}: {f['baseline']} -> {f['current']} ({f['change'] * 100.0:+.1f}%)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Score a benchmark run against its baseline.")
+    p.add_argument("--results", default=DEFAULT_RESULTS)
+    p.add_argument("--run", default="latest", help="run_id from history.json, 'latest', or a run JSON file")
+    p.add_argument("--label", help="baseline to compare against (default: the run's label)")
+    p.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = p.parse_args(argv)
+
+    if os.path.isfile(args.run):
+        run = _read(args.run, None)
+    else:
+        history = load_history(args.results)
+        matches = history[-1:] if args.run == "latest" else [r for r in history if r["run_id"] == args.run]
+        if not matches:
+            print(f"no run {args.run} in {args.results}/history.json", file=sys.stderr)
+            return 2
+        run = matches[-1]
+
+    baseline = load_baseline(args.results, args.label or run["label"])
+    run["regressions"] = compare(run, baseline, args.tolerance) if baseline else []
+    report(run, baseline)
+    return 1 if run["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
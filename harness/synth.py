@@ -0,0 +1,106 @@
+"""Synthetic corpora for the benchmark harness.
+
+Every generator is a pure function of a ``random.Random`` and its size
+arguments, so a given seed always produces byte-identical corpora. The
+shapes follow the sample files under ``ingest/``: Handey-style aphorisms
+for ``/ingest_text``, an XMLBIBLE book like ``proverbs_nkjv.xml`` for
+``/xml/explode`` and a ``panel.v2.6`` timeline like
+``raising_arizona_timeline.jsonl`` for ``/jsonl/explode``.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+from typing import List
+from xml.sax.saxutils import escape
+
+
+NOUNS = (
+    "river", "mirror", "ladder", "wolf", "lantern", "orchard", "shadow", "clock", "harbor", "sparrow",
+    "anvil", "meadow", "thunder", "garden", "compass", "letter", "window", "bridge", "ember", "stone",
+    "wisdom", "folly", "neighbor", "king", "servant", "merchant", "fool", "crown", "gate", "field",
+)
+VERBS = (
+    "asked", "mailed", "carried", "followed", "buried", "painted", "counted", "forgot", "answered", "built",
+    "watched", "traded", "broke", "kept", "opened", "borrowed", "sang to", "argued with", "hid", "lost",
+)
+ADJECTIVES = (
+    "quiet", "crooked", "golden", "hungry", "patient", "borrowed", "honest", "restless", "small", "ancient",
+)
+SHOTS = ("CLOSEUP", "ANGLE ON", "WIDE SHOT", "LOW ANGLE", "TRACKING", "INSERT", "OVER BLACK:", "POV")
+PLACES = ("KITCHEN", "PRISON HALL", "TRAILER", "DESERT ROAD", "BANK", "NURSERY", "MOTEL", "CAR")
+
+
+def _np(rng: random.Random) -> str:
+    return f"the {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}" if rng.random() < 0.4 else f"a {rng.choice(NOUNS)}"
+
+
+def sentence(rng: random.Random) -> str:
+    """One aphorism-shaped sentence."""
+    form = rng.randrange(4)
+    if form == 0:
+        s = f"I {rng.choice(VERBS)} {_np(rng)}, but it {rng.choice(VERBS)} {_np(rng)}"
+    elif form == 1:
+        s = f"{_np(rng).capitalize()} {rng.choice(VERBS)} {_np(rng)} and never {rng.choice(VERBS)} {_np(rng)}"
+    elif form == 2:
+        s = f"Whoever {rng.choice(VERBS)} {_np(rng)} will find {_np(rng)}"
+    else:
+        s = f"So I {rng.choice(VERBS)} {_np(rng)} until {_np(rng)} {rng.choice(VERBS)} me"
+    return s + rng.choice((".", ".", ".", "!", "?"))
+
+
+def text_corpus(rng: random.Random, docs: int, sentences: int) -> List[str]:
+    """``docs`` paragraphs of ``sentences`` sentences each."""
+    return [" ".join(sentence(rng) for _ in range(sentences)) for _ in range(docs)]
+
+
+def xml_corpus(rng: random.Random, chapters: int, verses: int, book: str = "Proverbs") -> str:
+    """An XMLBIBLE document with ``chapters`` chapters of ``verses`` verses."""
+    out = ['<?xml version="1.0" encoding="utf-8"?>', "<XMLBIBLE>", f'<BIBLEBOOK bnumber="20" bname="{book}">']
+    for c in range(1, chapters + 1):
+        out.append(f'<CHAPTER cnumber="{c}">')
+        for v in range(1, verses + 1):
+            out.append(f'<VERS vnumber="{v}">{escape(sentence(rng))}</VERS>')
+        out.append("</CHAPTER>")
+    out.append("</BIBLEBOOK>")
+    out.append("</XMLBIBLE>")
+    return "\n".join(out)
+
+
+def jsonl_corpus(rng: random.Random, rows: int, scene_rows: int = 40) -> str:
+    """
+    A panel.v2.6 timeline of about ``rows`` lines: a meta header, then scenes
+    opened by an INT./EXT. camera shot and filled with shots, actions and
+    subtitles whose ``seconds_in`` only jumps past the scene gap between
+    scenes.
+    """
+    lines = [{
+        "panel_type": "meta", "format_version": "panel.v2.6", "movie": "Synthetic (2025)",
+        "language": "en", "generated_on": "2025-01-01T00:00:00+00:00",
+    }]
+    seconds, page, shot_no = 0.0, 1, 0
+    while len(lines) < rows:
+        shot_no += 1
+        lines.append({
+            "panel_type": "camera_shot", "shot_id": f"shot_{shot_no:03d}", "page": page,
+            "text": f"{rng.choice(('INT.', 'EXT.'))} {rng.choice(PLACES)} - {rng.choice(('DAY', 'NIGHT'))}",
+        })
+        for _ in range(scene_rows):
+            if len(lines) >= rows:
+                break
+            kind = rng.random()
+            if kind < 0.15:
+                shot_no += 1
+                lines.append({"panel_type": "camera_shot", "shot_id": f"shot_{shot_no:03d}", "page": page,
+                              "text": rng.choice(SHOTS)})
+            elif kind < 0.55:
+                lines.append({"panel_type": "scene_unit", "page": page, "matched": rng.random() < 0.7,
+                              "seconds_in": round(seconds, 1), "text": sentence(rng)})
+            else:
+                seconds += rng.uniform(1.0, 8.0)
+                lines.append({"panel_type": "subtitle", "seconds_in": round(seconds, 1), "text": sentence(rng)})
+            if rng.random() < 0.05:
+                page += 1
+        seconds += rng.uniform(60.0, 120.0)   # past scene_gap_seconds
+    return "\n".join(json.dumps(line) for line in lines)
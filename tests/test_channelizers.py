@@ -0,0 +1,88 @@
+import hashlib
+import random
+import struct
+
+import numpy as np
+
+from api.channelizers import (
+    EMB_DIM,
+    REGISTRY,
+    _lexico_values,
+    channel_names,
+    lexico_semantic,
+    lexico_semantic_batch,
+    run_channels,
+    run_channels_batch,
+)
+from harness import synth
+
+
+TEXTS = [
+    "",
+    "   ",
+    "But if you never asked, so I kept the lantern; the gold and the silver, or the stone and the wind!",
+    "Is the river dark at night?",
+    "Go home now!",
+    "I told you: \"the harvest\" is 'late', my friend, my neighbor, my father.",
+    "Ünïcödé — the sun's light, “curly” quotes and ☃",
+    "x" * 500,
+] + synth.text_corpus(random.Random(7), 20, 3)
+
+
+def test_run_channels_batch_matches_run_channels_row_for_row():
+    batch = run_channels_batch(TEXTS)
+    assert list(batch) == channel_names()
+    for i, text in enumerate(TEXTS):
+        single = run_channels(text)
+        assert list(single) == list(batch)
+        for ch, row in single.items():
+            assert batch[ch].shape == (len(TEXTS), EMB_DIM)
+            assert batch[ch].dtype == np.float32
+            np.testing.assert_array_equal(batch[ch][i], np.asarray(row, dtype=np.float32), err_msg=f"{ch} row {i}")
+
+
+def test_batch_matches_scalar_channel_fns():
+    batch = run_channels_batch(TEXTS)
+    for ch in channel_names():
+        expected = np.asarray([REGISTRY[ch](t) for t in TEXTS], dtype=np.float32)
+        np.testing.assert_array_equal(batch[ch], expected, err_msg=ch)
+
+
+def test_run_channels_batch_empty_and_chosen():
+    out = run_channels_batch([], ["imagery", "nope"])
+    assert list(out) == ["imagery"]
+    assert out["imagery"].shape == (0, EMB_DIM)
+
+
+# ----- lexico_semantic: the vectorized decode must reproduce the original struct loop bit for bit -----
+def _lexico_reference(s):
+    h = hashlib.blake2b(s.encode("utf-8"), digest_size=64).digest()
+    vals = []
+    while len(vals) < EMB_DIM:
+        for i in range(0, len(h), 8):
+            vals.append(abs(struct.unpack(">q", h[i:i+8])[0]) % 10_000 / 10_000.0)
+            if len(vals) == EMB_DIM: break
+        h = hashlib.blake2b(h, digest_size=64).digest()
+    return vals
+
+
+def test_lexico_semantic_matches_reference_hash():
+    for text in TEXTS:
+        assert lexico_semantic(text) == _lexico_reference(text)
+
+
+def test_lexico_semantic_batch_matches_reference_hash():
+    expected = np.asarray([_lexico_reference(t) for t in TEXTS], dtype=np.float32)
+    got = lexico_semantic_batch(TEXTS)
+    assert got.dtype == np.float32
+    assert got.tobytes() == expected.tobytes()
+    assert lexico_semantic_batch([]).shape == (0, EMB_DIM)
+
+
+def test_lexico_values_edge_words():
+    words = [-2**63, -2**63 + 1, -1, 0, 1, 9_999, 10_000, -10_001, 2**63 - 1]
+    words += list(range(-20, 20))
+    words += [0] * (EMB_DIM - len(words))
+    buf = b"".join(struct.pack(">q", w) for w in words)
+    expected = [abs(w) % 10_000 / 10_000.0 for w in words]
+    assert _lexico_values(buf, 1)[0].tolist() == expected
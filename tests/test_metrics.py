@@ -0,0 +1,62 @@
+from api.services import metrics
+from api.services.metrics import Counter, Histogram
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    h = Histogram("t_seconds", "Test.", ("route",), buckets=(0.1, 1.0, 5.0))
+    for v in (0.05, 0.1, 0.5, 1.0, 2.0, 7.5):
+        h.observe(v, "/a")
+    h.observe(0.2, "/b")
+    assert h.render() == [
+        "# HELP t_seconds Test.",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{route="/a",le="0.1"} 2',
+        't_seconds_bucket{route="/a",le="1.0"} 4',
+        't_seconds_bucket{route="/a",le="5.0"} 5',
+        't_seconds_bucket{route="/a",le="+Inf"} 6',
+        't_seconds_sum{route="/a"} 11.15',
+        't_seconds_count{route="/a"} 6',
+        't_seconds_bucket{route="/b",le="0.1"} 0',
+        't_seconds_bucket{route="/b",le="1.0"} 1',
+        't_seconds_bucket{route="/b",le="5.0"} 1',
+        't_seconds_bucket{route="/b",le="+Inf"} 1',
+        't_seconds_sum{route="/b"} 0.2',
+        't_seconds_count{route="/b"} 1',
+    ]
+
+
+def test_histogram_without_labels_and_time():
+    h = Histogram("t_plain", "Plain.", buckets=(1.0,))
+    with h.time():
+        pass
+    lines = h.render()
+    assert lines[2:4] == ['t_plain_bucket{le="1.0"} 1', 't_plain_bucket{le="+Inf"} 1']
+    assert lines[-1] == "t_plain_count 1"
+
+
+def test_counter_render_escapes_labels():
+    c = Counter("t_total", "Count.", ("path",))
+    c.inc(1, 'a"b\\c\nd')
+    c.inc(2.5, 'a"b\\c\nd')
+    c.inc(1, "z")
+    assert c.render() == [
+        "# HELP t_total Count.",
+        "# TYPE t_total counter",
+        't_total{path="a\\"b\\\\c\\nd"} 3.5',
+        't_total{path="z"} 1',
+    ]
+
+
+def test_render_includes_pool_gauges():
+    text = metrics.render({
+        "sync": {"pool_size": 4, "pool_available": 1, "max_size": 10, "requests_waiting": 0,
+                 "requests_num": 12, "requests_wait_ms": 1500},
+        "async": None,
+    })
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    assert 'pst_pool_connections{pool="sync"} 4' in lines
+    assert 'pst_pool_saturation{pool="sync"} 0.3' in lines
+    assert 'pst_pool_wait_seconds_total{pool="sync"} 1.5' in lines
+    assert not any('pool="async"' in line for line in lines)
+    assert "# TYPE pst_http_request_duration_seconds histogram" in lines
@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from api.services.move_ingest import SentenceBuffer, sentence_split
+from harness import synth
+
+
+TEXTS = [
+    "",
+    "   \n\t ",
+    "no terminator at all",
+    "One.",
+    "One. Two! Three? ",
+    "  Leading space. Trailing space.   ",
+    "Wait...  what?!\n\nNew paragraph.\tTabbed. ",
+    "Mr. Smith went to Washington. He stayed!",
+    "Ends mid-thought and then.",
+    "?!.",
+    ". . .",
+    "Ünïcödé sentence. Another — with ☃!",
+] + [" ".join(synth.text_corpus(random.Random(seed), 3, 5)) for seed in range(5)]
+
+
+def _chunks(text, rng):
+    out, i = [], 0
+    while i < len(text):
+        n = rng.choice((1, 1, 2, 3, 5, 8, 13, 40))
+        out.append(text[i:i + n])
+        i += n
+    # empty chunks are legal too
+    for _ in range(rng.randrange(3)):
+        out.insert(rng.randrange(len(out) + 1), "")
+    return out
+
+
+def _buffered(chunks):
+    buf = SentenceBuffer()
+    out = []
+    for chunk in chunks:
+        out += buf.feed(chunk)
+    return out + buf.flush()
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_sentence_buffer_matches_sentence_split_under_any_chunking(text):
+    expected = sentence_split(text)
+    assert _buffered([text]) == expected
+    assert _buffered(list(text)) == expected
+    rng = random.Random(text)
+    for _ in range(50):
+        assert _buffered(_chunks(text, rng)) == expected
+
+
+def test_sentence_buffer_holds_back_the_trailing_fragment():
+    buf = SentenceBuffer()
+    assert buf.feed("First one. Sec") == ["First one."]
+    assert buf.feed("ond one") == []
+    assert buf.feed("! ") == ["Second one!"]
+    assert buf.flush() == []
+    assert buf.feed("tail") == []
+    assert buf.flush() == ["tail"]
+    assert buf.flush() == []
+
+
+def test_sentence_buffer_bounds_unpunctuated_input():
+    buf = SentenceBuffer(max_chars=50)
+    words = ["word%03d" % i for i in range(300)]
+    out = []
+    for w in words:
+        out += buf.feed(w + " ")
+        assert len(buf.carry) <= 50
+    out += buf.flush()
+    assert all(len(s) <= 50 for s in out)
+    assert " ".join(out).split() == words
+
+
+def test_sentence_buffer_hard_cuts_a_run_without_whitespace():
+    buf = SentenceBuffer(max_chars=10)
+    assert buf.feed("x" * 25) == ["x" * 10, "x" * 10]
+    assert buf.flush() == ["x" * 5]
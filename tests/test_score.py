@@ -0,0 +1,53 @@
+import pytest
+
+from harness import score
+
+
+def _run(**stages):
+    return {"stages": {name: dict(fields) for name, fields in stages.items()}}
+
+
+BASE = _run(
+    slow={"p50_ms": 100.0, "p95_ms": 200.0, "throughput": 50.0},
+    fast={"p50_ms": 0.5, "p95_ms": 1.0, "throughput": 2000.0},
+)
+
+
+def test_no_change_is_clean():
+    assert score.compare(BASE, BASE) == []
+
+
+def test_latency_within_tolerance_is_not_flagged():
+    run = _run(slow={"p50_ms": 114.9, "p95_ms": 229.0, "throughput": 50.0})
+    assert score.compare(run, BASE) == []
+
+
+def test_latency_beyond_tolerance_is_flagged():
+    run = _run(slow={"p50_ms": 120.0, "p95_ms": 200.0, "throughput": 50.0})
+    assert score.compare(run, BASE) == [
+        {"stage": "slow", "field": "p50_ms", "baseline": 100.0, "current": 120.0, "change": 0.2},
+    ]
+    assert score.compare(run, BASE, tolerance=0.25) == []
+
+
+def test_small_absolute_latency_changes_are_ignored():
+    # 4x slower, but only MIN_MS or less in absolute terms
+    run = _run(fast={"p50_ms": 0.5 + score.MIN_MS, "p95_ms": 1.0 + score.MIN_MS, "throughput": 2000.0})
+    assert score.compare(run, BASE) == []
+    run["stages"]["fast"]["p95_ms"] = 1.0 + score.MIN_MS + 0.01
+    assert [f["field"] for f in score.compare(run, BASE)] == ["p95_ms"]
+
+
+def test_throughput_drop_is_flagged():
+    run = _run(slow={"p50_ms": 100.0, "p95_ms": 200.0, "throughput": 42.0},
+               fast={"p50_ms": 0.5, "p95_ms": 1.0, "throughput": 1701.0})
+    flags = score.compare(run, BASE)
+    assert [(f["stage"], f["field"]) for f in flags] == [("slow", "throughput")]
+    assert flags[0]["change"] == pytest.approx(-0.16)
+
+
+def test_stages_missing_from_either_side_are_skipped():
+    run = _run(new={"p50_ms": 999.0, "p95_ms": 999.0, "throughput": 0.1},
+               slow={"p50_ms": None, "p95_ms": 500.0, "throughput": None})
+    base = _run(slow={"p50_ms": 100.0, "p95_ms": 0.0, "throughput": 50.0})
+    assert score.compare(run, base) == []
@@ -0,0 +1,137 @@
+import os
+from collections import defaultdict
+
+from lxml import etree
+
+from api.services.xml_rules import compile_rules
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROVERBS = os.path.join(ROOT, "ingest", "proverbs_nkjv.xml")
+
+BIBLE = b"""<?xml version="1.0" encoding="utf-8"?>
+<XMLBIBLE>
+  <BIBLEBOOK bnumber="20" bname="Proverbs">
+    <CHAPTER cnumber="1">
+      <VERS vnumber="1"> My son,   hear. </VERS>
+      <VERS vnumber="2">Keep <b>wisdom</b>.</VERS>
+      <VERS>Unnumbered.</VERS>
+    </CHAPTER>
+    <CHAPTER cnumber="3">
+      <VERS vnumber="5">Trust.</VERS>
+    </CHAPTER>
+  </BIBLEBOOK>
+</XMLBIBLE>"""
+
+TEI = b"""<?xml version="1.0"?>
+<TEI xmlns="http://www.tei-c.org/ns/1.0" xmlns:xml="http://www.w3.org/XML/1998/namespace">
+  <text><body>
+    <lg type="stanza" n="1"><head>First</head>
+      <l n="1">The <hi>quiet</hi> river   runs.</l>
+      <l n="x">A line without a number.</l>
+      <l>   </l>
+    </lg>
+    <lg type="stanza"><head/>
+      <l n="7" xml:id="l7">Seven.</l>
+    </lg>
+  </body></text>
+</TEI>"""
+
+BIBLE_RULES = {
+    "root_path": "/XMLBIBLE",
+    "units": [
+        {"kind": "book", "path": ".//BIBLEBOOK", "label_attr": "@bname",
+         "meta": {"bnumber": "@bnumber", "source": "nkjv", "empty": ""}},
+        {"kind": "chapter", "path": ".//CHAPTER", "ordinal_path": "@cnumber", "label_path": "string(@cnumber)",
+         "meta": {"book": "../@bname"}},
+        {"kind": "verse", "path": ".//VERS", "ordinal": "@vnumber", "text_path": "normalize-space(.)",
+         "meta": {"chapter": "../@cnumber", "book": "string(../../@bname)"}},
+    ],
+}
+
+TEI_RULES = {
+    "namespaces": {"tei": "http://www.tei-c.org/ns/1.0"},
+    "root_path": "//tei:body",
+    "units": [
+        {"kind": "stanza", "path": ".//tei:lg", "label_path": "tei:head", "label_attr": "type",
+         "ordinal": "@n", "meta": {"type": "@type", "head": "./tei:head"}},
+        {"kind": "line", "path": ".//tei:l", "ordinal_path": "@n", "text_path": ".//text()",
+         "meta": {"id": "@xml:id", "stanza": "concat(../@type, '-', ../@n)", "kind": "verse-line"}},
+        {"kind": "fixed", "path": ".//tei:lg", "ordinal": "3", "text_path": "./tei:head/text()"},
+    ],
+}
+
+
+def _explode(rules, xml):
+    """(kind, node path, label, meta, ordinal, text) per unit, in rules order."""
+    doc = etree.fromstring(xml).getroottree()
+    compiled = compile_rules(rules)
+    counters = defaultdict(int)
+    out = []
+    for root in compiled.root(doc):
+        for unit in compiled.units:
+            for node in unit.select(root):
+                out.append((unit.kind, doc.getpath(node), unit.label(node), unit.meta_for(node),
+                            unit.ordinal(node, counters), unit.text(node)))
+    return out
+
+
+def test_bible_rules():
+    book, ch = "/XMLBIBLE/BIBLEBOOK", "/XMLBIBLE/BIBLEBOOK/CHAPTER"
+    assert _explode(BIBLE_RULES, BIBLE) == [
+        # label_attr, xpath and constant meta (empty constants dropped), counted ordinal
+        ("book", book, "Proverbs", {"bnumber": "20", "source": "nkjv"}, 1,
+         "My son, hear. Keep wisdom. Unnumbered. Trust."),
+        # ordinal_path and a string() label
+        ("chapter", f"{ch}[1]", "1", {"book": "Proverbs"}, 1, "My son, hear. Keep wisdom. Unnumbered."),
+        ("chapter", f"{ch}[2]", "3", {"book": "Proverbs"}, 3, "Trust."),
+        # an xpath ordinal; a verse without vnumber continues from the highest ordinal so far
+        ("verse", f"{ch}[1]/VERS[1]", None, {"chapter": "1", "book": "Proverbs"}, 1, "My son, hear."),
+        ("verse", f"{ch}[1]/VERS[2]", None, {"chapter": "1", "book": "Proverbs"}, 2, "Keep wisdom."),
+        ("verse", f"{ch}[1]/VERS[3]", None, {"chapter": "1", "book": "Proverbs"}, 3, "Unnumbered."),
+        ("verse", f"{ch}[2]/VERS", None, {"chapter": "3", "book": "Proverbs"}, 5, "Trust."),
+    ]
+
+
+def test_namespaced_tei_rules():
+    lg = "/*/*/*/*"
+    assert _explode(TEI_RULES, TEI) == [
+        # label_path wins over label_attr, which is the fallback when head is empty
+        ("stanza", f"{lg}[1]", "First", {"type": "stanza", "head": "First"}, 1,
+         "First The quiet river runs. A line without a number."),
+        ("stanza", f"{lg}[2]", "stanza", {"type": "stanza"}, 2, "Seven."),
+        # text() nodes are stripped and joined; a non-numeric @n falls back to the counter
+        ("line", f"{lg}[1]/*[2]", None, {"stanza": "stanza-1", "kind": "verse-line"}, 1, "The quiet river   runs."),
+        ("line", f"{lg}[1]/*[3]", None, {"stanza": "stanza-1", "kind": "verse-line"}, 2, "A line without a number."),
+        ("line", f"{lg}[1]/*[4]", None, {"stanza": "stanza-1", "kind": "verse-line"}, 3, None),
+        ("line", f"{lg}[2]/*[2]", None, {"id": "l7", "stanza": "stanza-", "kind": "verse-line"}, 7, "Seven."),
+        # a constant ordinal
+        ("fixed", f"{lg}[1]", None, {}, 3, "First"),
+        ("fixed", f"{lg}[2]", None, {}, 3, None),
+    ]
+
+
+def test_proverbs_sample_explodes():
+    with open(PROVERBS, "rb") as fh:
+        rows = _explode(BIBLE_RULES, fh.read())
+    kinds = [r[0] for r in rows]
+    assert kinds.count("book") == 1 and kinds.count("chapter") == 31
+    assert rows[0][2] == "Proverbs"
+    first_verse = rows[kinds.index("verse")]
+    assert first_verse[3:5] == ({"chapter": "1", "book": "Proverbs"}, 1)
+    assert first_verse[5] == "The proverbs of Solomon the son of David, king of Israel:"
+
+
+def test_callable_meta_compiles_without_caching():
+    rules = {"root_path": "/XMLBIBLE", "units": [
+        {"kind": "book", "path": ".//BIBLEBOOK", "meta": {"tag": lambda node: node.tag.lower()}},
+    ]}
+    assert _explode(rules, BIBLE)[0][3] == {"tag": "biblebook"}
+    assert compile_rules(rules) is not compile_rules(rules)
+
+
+def test_compile_rules_is_cached_by_content():
+    same = dict(reversed(list(BIBLE_RULES.items())))
+    assert compile_rules(BIBLE_RULES) is compile_rules(same)
+    assert compile_rules(BIBLE_RULES) is compile_rules(dict(BIBLE_RULES, stream=True, clear_existing=True))
+    assert compile_rules(BIBLE_RULES) is not compile_rules(TEI_RULES)
@@ -1,25 +1,242 @@
-import os, time, math
+import os, time, math, json, socket, asyncio, threading
 import psycopg
 
+from api.services.cache import publish as publish_invalidation
+from api.services.jobs import claim_next, ensure_job_table, run_job
+from api.services.vector_cache import ensure_channel_vector_table
+
 DB_URL = os.environ["DATABASE_URL"]
-ALPHA = 0.15   # freq → weight curve
-HALF_LIFE_DAYS = 45
+ALPHA = float(os.getenv("ALPHA", "0.15"))   # freq → weight curve
+HALF_LIFE_DAYS = float(os.getenv("HALF_LIFE_DAYS", "45"))
+DECAY_CHUNK = int(os.getenv("DECAY_CHUNK", "5000"))
+DECAY_TABLES = [t.strip() for t in os.getenv("DECAY_TABLES", "trajectory,move_edge").split(",") if t.strip()]
+DECAY_INTERVAL = int(os.getenv("DECAY_INTERVAL", "3600"))
+DECAY_MIN_STEP = float(os.getenv("DECAY_MIN_STEP", "0.01"))   # smallest age-factor decay worth a pass
+CURVATURE_BATCH = int(os.getenv("CURVATURE_BATCH", "5000"))   # curvature_pending edges per refresh call
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+WORKER_NAME = os.getenv("WORKER_NAME", socket.gethostname())
 
-def step():
-    with psycopg.connect(DB_URL) as conn, conn.cursor() as cur:
-        # decay factor by last_seen age
+# trajectory weight is a function of freq, so it is rebuilt from the decayed freq
+WEIGHT_EXPR = {
+    "trajectory": "1 - exp(-%(alpha)s * d.new_freq)",
+}
+# move_edge weight is evidence-driven (recompute_move_edge_v2/_ann in pst_merge_ddl.sql),
+# so only the age factor is applied to it
+AGE_FACTOR_TABLES = {"move_edge"}
+
+def ensure_tables(conn):
+    conn.execute("""
+      CREATE TABLE IF NOT EXISTS worker_checkpoint (
+        name          TEXT PRIMARY KEY,
+        last_id       BIGINT,            -- NULL when no pass is in flight
+        run_started   TIMESTAMPTZ,
+        finished_at   TIMESTAMPTZ,
+        rows_scanned  BIGINT DEFAULT 0,
+        rows_touched  BIGINT DEFAULT 0,
+        last_run_ms   DOUBLE PRECISION,
+        decayed_to    TIMESTAMPTZ        -- age-factor tables: decay applied up to here
+      )
+    """)
+    conn.execute("ALTER TABLE worker_checkpoint ADD COLUMN IF NOT EXISTS decayed_to TIMESTAMPTZ")
+    ensure_job_table(conn)
+    ensure_channel_vector_table(conn)
+    conn.commit()
+
+def decay_table(conn, table):
+    """
+    Decay one table in keyset-paginated chunks, one short transaction each.
+
+    trajectory decays freq and rebuilds weight from it. Tables in
+    AGE_FACTOR_TABLES keep their weight and only have it multiplied by
+    exp(-age/half-life), where age runs from the later of last_seen and the
+    previous pass (decayed_to), so repeated passes do not compound. Rows
+    whose value would not change are skipped. An age-factor pass starts only
+    once decay since the last one exceeds DECAY_MIN_STEP; it then writes
+    every row seen before the pass began, however small its factor, since
+    advancing decayed_to forgoes that row's decay up to the new mark. The
+    checkpoint row is advanced in the same transaction as each chunk so an
+    interrupted pass resumes where it stopped.
+    """
+    name = f"decay:{table}"
+    age_only = table in AGE_FACTOR_TABLES
+    t0 = time.monotonic()
+
+    with conn.cursor() as cur:
+        cur.execute("""
+          INSERT INTO worker_checkpoint (name) VALUES (%s)
+          ON CONFLICT (name) DO NOTHING
+        """, (name,))
+        cur.execute("""
+          SELECT last_id, rows_scanned, rows_touched, decayed_to,
+                 exp(- EXTRACT(EPOCH FROM (now() - decayed_to))/(86400*%s))
+          FROM worker_checkpoint WHERE name=%s FOR UPDATE
+        """, (HALF_LIFE_DAYS, name))
+        last_id, scanned, touched, decayed_to, pass_factor = cur.fetchone()
+        if last_id is None:
+            if age_only and pass_factor is not None and pass_factor > 1.0 - DECAY_MIN_STEP:
+                conn.commit()
+                return {"table": table, "rows_scanned": 0, "rows_touched": 0, "skipped": True,
+                        "ms": round((time.monotonic() - t0) * 1000.0, 1)}
+            last_id, scanned, touched = 0, 0, 0
+            cur.execute("""
+              UPDATE worker_checkpoint
+              SET last_id=0, run_started=now(), rows_scanned=0, rows_touched=0
+              WHERE name=%s
+            """, (name,))
+        cur.execute("SELECT run_started FROM worker_checkpoint WHERE name=%s", (name,))
+        run_started = cur.fetchone()[0]
+        conn.commit()
+
+        if age_only:
+            sql = f"""
+              WITH chunk AS (
+                SELECT id FROM {table} WHERE id > %(last)s ORDER BY id LIMIT %(n)s
+              ),
+              d AS (
+                SELECT x.id,
+                       exp(- EXTRACT(EPOCH FROM (%(at)s - GREATEST(x.last_seen, %(since)s::timestamptz)))/(86400*%(hl)s)) AS f
+                FROM {table} x JOIN chunk USING (id)
+                WHERE x.weight > 0
+              ),
+              upd AS (
+                UPDATE {table} t
+                SET weight = t.weight * d.f
+                FROM d
+                WHERE t.id = d.id AND d.f < 1
+                RETURNING t.id
+              )
+              SELECT (SELECT max(id) FROM chunk), (SELECT count(*) FROM chunk), (SELECT count(*) FROM upd)
+            """
+        else:
+            weight_expr = WEIGHT_EXPR[table] % {"alpha": ALPHA}
+            sql = f"""
+              WITH chunk AS (
+                SELECT id FROM {table} WHERE id > %(last)s ORDER BY id LIMIT %(n)s
+              ),
+              d AS (
+                SELECT x.id,
+                       GREATEST(0, round(x.freq * exp(- EXTRACT(EPOCH FROM (now()-x.last_seen))/(86400*%(hl)s))::numeric, 0))::int AS new_freq
+                FROM {table} x JOIN chunk USING (id)
+              ),
+              upd AS (
+                UPDATE {table} t
+                SET freq = d.new_freq,
+                    weight = {weight_expr}
+                FROM d
+                WHERE t.id = d.id
+                  AND (t.freq IS DISTINCT FROM d.new_freq
+                       OR t.weight IS NULL
+                       OR abs(t.weight - ({weight_expr})) > 1e-9)
+                RETURNING t.id
+              )
+              SELECT (SELECT max(id) FROM chunk), (SELECT count(*) FROM chunk), (SELECT count(*) FROM upd)
+            """
+
+        while True:
+            cur.execute(sql, {"last": last_id, "n": DECAY_CHUNK, "hl": HALF_LIFE_DAYS,
+                              "at": run_started, "since": decayed_to})
+            hi, n_scanned, n_touched = cur.fetchone()
+            if hi is None:
+                break
+            last_id = hi
+            scanned += n_scanned
+            touched += n_touched
+            cur.execute("""
+              UPDATE worker_checkpoint SET last_id=%s, rows_scanned=%s, rows_touched=%s WHERE name=%s
+            """, (last_id, scanned, touched, name))
+            conn.commit()
+
+        elapsed_ms = (time.monotonic() - t0) * 1000.0
         cur.execute("""
-          UPDATE trajectory
-          SET freq = GREATEST(0, round(freq * exp(- EXTRACT(EPOCH FROM (now()-last_seen))/(86400*%s))::numeric,0))
-        """, (HALF_LIFE_DAYS,))
-        # recompute weight from freq
-        cur.execute("""UPDATE trajectory SET weight = 1 - exp(-%s * freq)""", (ALPHA,))
+          UPDATE worker_checkpoint
+          SET last_id=NULL, finished_at=now(), last_run_ms=%s,
+              decayed_to = CASE WHEN %s THEN run_started ELSE decayed_to END
+          WHERE name=%s
+        """, (elapsed_ms, age_only, name))
         conn.commit()
 
+    return {"table": table, "rows_scanned": scanned, "rows_touched": touched, "ms": round(elapsed_ms, 1)}
+
+def drain_curvature(conn):
+    """
+    Fold queued edges into curvature_multi, CURVATURE_BATCH at a time, one
+    transaction per batch. Only the backlog present at the start is drained;
+    edges queued meanwhile wait for the next step. Returns None when the
+    curvature tables (db/sql/pst_merge_ddl.sql) are not installed.
+    """
+    t0 = time.monotonic()
+    with conn.cursor() as cur:
+        try:
+            cur.execute("SELECT count(*) FROM curvature_pending")
+        except psycopg.errors.UndefinedTable:
+            conn.rollback()
+            return None
+        pending = cur.fetchone()[0]
+        conn.commit()
+        batches, rows = 0, 0
+        while batches * CURVATURE_BATCH < pending:
+            cur.execute("SELECT refresh_curvature_multi(%s)", (CURVATURE_BATCH,))
+            rows += cur.fetchone()[0] or 0
+            conn.commit()
+            batches += 1
+            cur.execute("SELECT EXISTS (SELECT 1 FROM curvature_pending)")
+            if not cur.fetchone()[0]:
+                break
+        conn.commit()
+    return {"table": "curvature_pending", "pending": pending, "batches": batches, "rows_upserted": rows,
+            "ms": round((time.monotonic() - t0) * 1000.0, 1)}
+
+def step():
+    with psycopg.connect(DB_URL) as conn:
+        ensure_tables(conn)
+        touched = 0
+        for table in DECAY_TABLES:
+            metrics = decay_table(conn, table)
+            touched += metrics["rows_touched"]
+            print("worker metrics:", json.dumps(metrics))
+        # decayed weights and newly ingested edges are queued by the move_edge triggers
+        metrics = drain_curvature(conn)
+        if metrics is not None:
+            print("worker metrics:", json.dumps(metrics))
+        if touched:
+            # weights moved: tell API processes to drop cached predictions
+            publish_invalidation(conn, all=True)
+            conn.commit()
+
+def consume_jobs(slot, loop):
+    """Claim and run queued jobs forever; one of JOB_CONCURRENCY threads."""
+    worker = f"{WORKER_NAME}:{slot}"
+    while True:
+        try:
+            with psycopg.connect(DB_URL) as conn:
+                while True:
+                    job = claim_next(conn, worker)
+                    if job is None:
+                        time.sleep(JOB_POLL_SECONDS)
+                        continue
+                    t0 = time.monotonic()
+                    state = run_job(conn, job, DB_URL, loop)
+                    print("worker job:", json.dumps({"id": job["id"], "kind": job["kind"], "state": state,
+                                                     "ms": round((time.monotonic() - t0) * 1000.0, 1)}))
+        except Exception as e:
+            print("worker job error:", e)
+            time.sleep(JOB_POLL_SECONDS)
+
+def start_job_consumers():
+    # async handlers (process_corpus) share one long-lived loop so the asyncpg pool stays bound to it
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="job-loop", daemon=True).start()
+    for slot in range(JOB_CONCURRENCY):
+        threading.Thread(target=consume_jobs, args=(slot, loop), name=f"job-{slot}", daemon=True).start()
+
 if __name__ == "__main__":
+    with psycopg.connect(DB_URL) as conn:
+        ensure_tables(conn)
+    start_job_consumers()
     while True:
         try:
             step()
         except Exception as e:
             print("worker error:", e)
-        time.sleep(3600)
+        time.sleep(DECAY_INTERVAL)